@@ -4,16 +4,36 @@ Production-ready Real F1 Data API Server
 Optimized for cloud deployment
 """
 
-import fastf1
-from fastf1 import plotting
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
+import hmac
 import json
 import os
-import pandas as pd
-import numpy as np
-from datetime import datetime
 import logging
+import threading
+import time
+from functools import partial, wraps
+
+from session_cache import (CACHE_DIR, FASTF1_VERSION, TIER_LOAD_ARGS, OverBudget, fastf1_imported,
+                           import_fastf1, make_session_key, session_cache, use_fastf1_cache)
+from serializers import (driver_summary, payload_from_lap_columns, table_from_lap_columns,
+                         telemetry_records)
+from session_store import session_store
+from disk_cache import disk_cache
+from lap_index import session_lap_index
+from encoders import MEDIA_TYPES, UnsupportedFormat, encode_columns, negotiate_format
+from downsample import downsample_columns
+import warmup
+from schedule import race_calendar
+from http_cache import http_cached
+from jobs import QueueFull, job_manager
+import metrics
+from metrics import phase
+from stints import FUEL_EFFECT, stint_records, stint_table
+from season import season_cache
+from comparison import COMPARISON_POINTS, MINI_SECTORS, compare_laps, comparison_payload
+from replay import (REPLAY_SPEED, TooManyReplays, TooManySubscribers, replay_hub, replay_speed,
+                    replay_timeline)
 
 # Configure logging for production
 logging.basicConfig(level=logging.INFO)
@@ -21,14 +41,32 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='../static')
 CORS(app)
+app.before_request(metrics.start_request)
+app.after_request(metrics.finish_request)
+
+# FastF1 (with pandas and matplotlib) is only imported when first needed, so
+# /health, static files and 304 answers are served before it is loaded.
+# Nothing here plots, so matplotlib is never configured.
+os.makedirs(CACHE_DIR, exist_ok=True)
+use_fastf1_cache(CACHE_DIR)
+
+# Import the FastF1 stack in the background from the first request on, so
+# data requests rarely wait for it (WARM_IMPORTS=0 imports on first use only)
+WARM_IMPORTS = os.environ.get('WARM_IMPORTS', '1') != '0'
+_warm_once = threading.Lock()
+
+def warm_imports():
+    started = time.time()
+    import_fastf1()
+    metrics.record_startup('fastf1_import', time.time() - started)
+    logger.info(f"FastF1 imported in the background in {time.time() - started:.2f}s")
 
-# Configure FastF1
-plotting.setup_mpl(backend='Agg')  # Use non-interactive backend for server
+def start_warm_imports():
+    """Start warm_imports() once per process, after any fork by the server"""
+    if WARM_IMPORTS and _warm_once.acquire(blocking=False):
+        threading.Thread(target=warm_imports, name='warm-imports', daemon=True).start()
 
-# Create cache directory
-cache_dir = os.path.join(os.path.dirname(__file__), '..', 'cache')
-os.makedirs(cache_dir, exist_ok=True)
-fastf1.Cache.enable_cache(cache_dir)
+app.before_request(start_warm_imports)
 
 # Serve static files
 @app.route('/')
@@ -39,29 +77,263 @@ def serve_index():
 def serve_static(filename):
     return send_from_directory('.', filename)
 
-# Team colors for visualization
-TEAM_COLORS = {
-    'Red Bull Racing': '#0600EF',
-    'Mercedes': '#00D2BE',
-    'Ferrari': '#DC143C',
-    'McLaren': '#FF8700',
-    'Alpine': '#0077CC',
-    'AlphaTauri': '#2B4562',
-    'Aston Martin': '#006F62',
-    'Williams': '#005AFF',
-    'Alfa Romeo': '#900000',
-    'Haas': '#FFFFFF'
-}
+def columnar_response(columns, meta, fmt):
+    """Encoded columnar payload with the format's media type"""
+    return Response(encode_columns(columns, meta, fmt), mimetype=MEDIA_TYPES[fmt])
+
+# Cold loads run as background jobs; data endpoints answer 202 until ready
+ASYNC_LOADS = os.environ.get('ASYNC_LOADS', '1') != '0'
+
+def session_ready(year, race_name, tier):
+    """True if data for ``tier`` can be served without loading the session"""
+    stored = session_store.open(make_session_key(year, race_name, 'R'))
+    if stored is not None and (tier == 'results' or getattr(stored, f"has_{tier}")):
+        return True
+    return session_cache.peek(year, race_name, 'R', tier=tier) is not None
+
+def job_response(job, status=202):
+    """JSON description of a load job with polling hints"""
+    response = jsonify({
+        "job": job.to_dict(),
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events"
+    })
+    response.status_code = status
+    response.headers['Location'] = f"/api/jobs/{job.id}"
+    response.headers['Retry-After'] = '2'
+    return response
+
+def unavailable_response(error, retry_after=30):
+    """503 asking the client to come back once the load queue or memory frees up"""
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def pending_load(year, race_name, tier):
+    """None if the session is ready, otherwise a 202 for its background load job"""
+    if not ASYNC_LOADS or session_ready(year, race_name, tier):
+        return None
+    try:
+        job = job_manager.submit(year, race_name, 'R', tier)
+    except QueueFull as e:
+        return unavailable_response(e)
+    return job_response(job)
+
+def lap_source(year, race_name):
+    """Lap columns, driver summaries, driver list and lap rows for a race
+    
+    The lap rows (lap_index.LapRows) map (driver, lap) to rows of the lap
+    columns.
+    
+    Served from the shared on-disk store when present; otherwise the session
+    is loaded and written to the store for the other workers.
+    """
+    key = make_session_key(year, race_name, 'R')
+    with phase('load'):
+        stored = session_store.lookup(key, 'laps')
+        if stored is None:
+            # Load race session (served from the in-process cache when hot)
+            race = session_cache.get(year, race_name, 'R', tier='laps')
+            stored = session_store.write(key, race, tier='laps')
+    with phase('extract'):
+        if stored is None:
+            index = session_lap_index(race)
+            return index.columns, partial(driver_summary, race), list(race.drivers), index.laps
+        columns = stored.lap_columns()
+        return columns, stored.driver_summary, stored.drivers, stored.lap_rows(columns)
+
+def telemetry_source(year, race_name):
+    """Function mapping (driver, lap) to raw telemetry columns for a race
+    
+    Resolves the race once: laps are sliced from the shared store, which is
+    written from the loaded session on a miss.
+    """
+    session_key = make_session_key(year, race_name, 'R')
+    with phase('load'):
+        stored = session_store.lookup(session_key, 'telemetry')
+        if stored is None:
+            # Load race session (served from the in-process cache when hot)
+            race = session_cache.get(year, race_name, 'R', tier='telemetry')
+            stored = session_store.write(session_key, race, tier='telemetry')
+    if stored is None:
+        # Store not writable: slice the session's in-memory lap index instead
+        return session_lap_index(race, telemetry=True).lap_telemetry
+    # Contiguous slice of the driver's memory-mapped car data
+    return stored.lap_telemetry
+
+def cached_telemetry_source(year, race_name):
+    """telemetry_source() behind a callable that resolves the race at most once
+    
+    Nothing is loaded until the first lap missing from the derived cache
+    asks for it; later laps of the same request reuse the result.
+    """
+    resolved = {}
+    def source():
+        if 'extract_lap' not in resolved:
+            resolved['extract_lap'] = telemetry_source(year, race_name)
+        return resolved['extract_lap']
+    return source
+
+def lap_telemetry(year, race_name, driver_code, lap_number, points=None, resolution=None,
+                  source=None):
+    """Downsampled telemetry columns of one lap
+    
+    Cached per (session, driver, lap, resolution). ``source`` (see
+    cached_telemetry_source()) returns the extraction function, so requests
+    for several laps resolve the race only once.
+    """
+    def extract():
+        extract_lap = source() if source else telemetry_source(year, race_name)
+        with phase('extract'):
+            columns = extract_lap(driver_code, lap_number)
+            return downsample_columns(columns, points=points, resolution=resolution)
+    
+    cache_key = (make_session_key(year, race_name, 'R'), 'telemetry',
+                 driver_code, lap_number, points, resolution)
+    return session_cache.derived.get_or_compute(cache_key, extract)
 
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
     return jsonify({
         "status": "healthy", 
-        "fastf1_version": fastf1.__version__,
+        "fastf1_version": FASTF1_VERSION,
+        "fastf1_loaded": fastf1_imported(),
+        "startup": metrics.startup_times(),
         "message": "F1 Data API is running"
     })
 
+def admin_required(view):
+    """Require the ADMIN_TOKEN for admin endpoints, refused when none is configured"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get('ADMIN_TOKEN')
+        if not token:
+            return jsonify({"error": "Admin endpoints are disabled (ADMIN_TOKEN is not set)"}), 403
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def metrics_token_required(view):
+    """Require ``Authorization: Bearer <METRICS_TOKEN>`` when METRICS_TOKEN is set"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/cache')
+@admin_required
+def get_cache_stats():
+    """Report session cache and shared store usage"""
+    return jsonify({**session_cache.stats(), "store": session_store.stats(),
+                    "replays": replay_hub.stats()})
+
+@app.route('/metrics')
+@metrics_token_required
+def get_metrics():
+    """Prometheus text exposition of request timings and cache state"""
+    lines = metrics.cache_metric_lines(session_cache.stats(), session_store.stats(),
+                                       job_manager.stats(), replay_hub.stats())
+    lines += metrics.disk_cache_metric_lines(disk_cache.counters(), disk_cache.max_bytes)
+    return Response(metrics.render_metrics(lines), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/cache/invalidate', methods=['POST'])
+@admin_required
+def invalidate_cache():
+    """Drop cached and stored sessions, optionally filtered by year/race/session"""
+    try:
+        params = request.get_json(silent=True) or request.args
+        selector = dict(
+            year=params.get('year'),
+            race_name=params.get('race'),
+            session_type=params.get('session')
+        )
+        removed = session_cache.invalidate(**selector)
+        stored = session_store.invalidate(**selector)
+        return jsonify({"invalidated": removed, "stored": stored})
+    except Exception as e:
+        logger.error(f"Error invalidating cache: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/admin/disk-cache')
+@admin_required
+def get_disk_cache_stats():
+    """Size of the on-disk cache per season and session, and load hit rates"""
+    try:
+        return jsonify(disk_cache.stats())
+    except Exception as e:
+        logger.error(f"Error reading disk cache: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/admin/disk-cache/enforce', methods=['POST'])
+@admin_required
+def enforce_disk_cache():
+    """Compact and evict cached sessions until the disk budget is met"""
+    try:
+        params = request.get_json(silent=True) or request.args
+        dry_run = str(params.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        return jsonify(disk_cache.enforce(dry_run=dry_run))
+    except Exception as e:
+        logger.error(f"Error enforcing disk cache: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# State of the background warm-up started from /admin/warmup
+warmup_state = {"running": False, "params": None, "status": None, "error": None}
+warmup_lock = threading.Lock()
+
+def run_background_warmup(params):
+    """Thread target: run a warm-up and record its progress"""
+    def progress(status):
+        warmup_state['status'] = status
+    try:
+        warmup.run_warmup(progress=progress, **params)
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}")
+        warmup_state['error'] = str(e)
+    finally:
+        warmup_state['running'] = False
+
+@app.route('/admin/warmup', methods=['GET', 'POST'])
+@admin_required
+def admin_warmup():
+    """Start a cache warm-up (POST) or report its progress (GET)"""
+    if request.method == 'GET':
+        return jsonify(warmup_state)
+    
+    try:
+        body = request.get_json(silent=True) or {}
+        sessions = body.get('sessions', list(warmup.DEFAULT_SESSIONS))
+        params = {
+            "years": warmup.parse_years(body.get('years', '')),
+            "session_types": sessions.split(',') if isinstance(sessions, str) else sessions,
+            "workers": min(max(int(body.get('workers', warmup.DEFAULT_WORKERS)), 1),
+                           warmup.MAX_API_WORKERS),
+            "tier": body.get('tier', 'telemetry'),
+            "force": bool(body.get('force', False))
+        }
+        if not params['years']:
+            return jsonify({"error": "Missing required parameter: years"}), 400
+        if params['tier'] not in TIER_LOAD_ARGS:
+            return jsonify({"error": f"Unknown tier: {params['tier']}"}), 400
+        
+        with warmup_lock:
+            if warmup_state['running']:
+                return jsonify({"error": "Warm-up already running", **warmup_state}), 409
+            warmup_state.update(running=True, params=params, status=None, error=None)
+        
+        threading.Thread(target=run_background_warmup, args=(params,), daemon=True).start()
+        return jsonify(warmup_state), 202
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error starting warm-up: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/years')
 def get_available_years():
     """Get available F1 seasons"""
@@ -74,52 +346,89 @@ def get_available_years():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/races/<int:year>')
+@http_cached
 def get_race_schedule(year):
     """Get race schedule for a specific year"""
     try:
-        schedule = fastf1.get_event_schedule(year)
-        
-        races = []
-        for _, race in schedule.iterrows():
-            if pd.notna(race['Session5Date']):  # Has race session
-                races.append({
-                    "round": int(race['RoundNumber']),
-                    "name": race['EventName'],
-                    "location": race['Location'],
-                    "country": race['Country']
-                })
+        # Schedules are memoized in process; past seasons are fetched once
+        races = race_calendar(year)
         
         return jsonify(races)
     except Exception as e:
         logger.error(f"Error getting race schedule for {year}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/season/<int:year>')
+@http_cached
+def get_season_summary(year):
+    """Per-event driver summaries (result, fastest lap, pace) for a whole season"""
+    try:
+        session_type = request.args.get('session', 'R').strip().upper()
+        drivers_param = request.args.get('drivers', '')
+        driver_codes = [d.strip() for d in drivers_param.split(',') if d.strip()] or None
+        
+        # Events are summarized once on a process pool; only new ones are computed
+        with phase('load'):
+            if not ASYNC_LOADS:
+                season_cache.refresh(year, session_type)
+            events, pending, failed = season_cache.query(year, session_type, driver_codes)
+        
+        payload = {
+            "year": year,
+            "session": session_type,
+            "events": events,
+            "pending": pending,
+            "failed": {str(round_number): error for round_number, error in failed.items()}
+        }
+        if pending:
+            # Partial answer while the missing events are summarized
+            progress = season_cache.refresh_in_background(year, session_type)
+            response = jsonify({**payload, "progress": dict(progress)})
+            response.status_code = 202
+            response.headers['Retry-After'] = '5'
+            return response
+        
+        with phase('serialize'):
+            response = jsonify(payload)
+        if failed:
+            # Failed events are retried later, so don't let clients keep this answer
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Error getting season summary for {year}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/drivers/<int:year>/<race_name>')
+@http_cached
 def get_drivers(year, race_name):
     """Get drivers for a specific race"""
     try:
-        # Load race session
-        race = fastf1.get_session(year, race_name, 'R')
-        race.load()
+        pending = pending_load(year, race_name, 'results')
+        if pending is not None:
+            return pending
         
-        drivers = []
-        for driver_code in race.drivers:
-            driver_info = race.get_driver(driver_code)
-            team_name = driver_info.get('TeamName', 'Unknown')
-            
-            drivers.append({
-                "code": driver_code,
-                "name": f"{driver_info.get('FirstName', '')} {driver_info.get('LastName', '')}".strip(),
-                "team": team_name,
-                "color": TEAM_COLORS.get(team_name, '#CCCCCC')
-            })
+        with phase('load'):
+            stored = session_store.open(make_session_key(year, race_name, 'R'))
+            if stored is None:
+                # Only results are needed for the driver list, no laps or telemetry
+                race = session_cache.get(year, race_name, 'R', tier='results')
         
-        return jsonify(drivers)
+        with phase('extract'):
+            if stored is not None:
+                drivers = [stored.driver_summary(driver_code) for driver_code in stored.drivers]
+            else:
+                drivers = [driver_summary(race, driver_code) for driver_code in race.drivers]
+        
+        with phase('serialize'):
+            return jsonify(drivers)
+    except OverBudget as e:
+        return unavailable_response(e, e.retry_after)
     except Exception as e:
         logger.error(f"Error getting drivers for {year} {race_name}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/lap-times')
+@http_cached
 def get_lap_times():
     """Get lap times for specific drivers in a race"""
     try:
@@ -130,68 +439,88 @@ def get_lap_times():
         if not all([year, race_name, drivers_param]):
             return jsonify({"error": "Missing required parameters"}), 400
         
-        driver_codes = [d.strip() for d in drivers_param.split(',')]
+        try:
+            fmt = negotiate_format(request.args, request.headers.get('Accept'))
+        except UnsupportedFormat as e:
+            return jsonify({"error": str(e)}), 406
+        
+        pending = pending_load(year, race_name, 'laps')
+        if pending is not None:
+            return pending
+        
+        columns, summarize, all_drivers, rows = lap_source(year, race_name)
+        
+        if drivers_param.strip().lower() == 'all':
+            driver_codes = all_drivers
+        else:
+            driver_codes = [d.strip() for d in drivers_param.split(',')]
         
-        # Load race session
-        race = fastf1.get_session(year, race_name, 'R')
-        race.load()
+        if fmt != 'json':
+            with phase('extract'):
+                drivers, compounds, table = table_from_lap_columns(columns, driver_codes, summarize, rows)
+            with phase('serialize'):
+                return columnar_response(table, {"drivers": drivers, "compounds": compounds}, fmt)
         
-        lap_data = {}
+        # Whole-field columnar conversion in one pass
+        with phase('extract'):
+            lap_data = payload_from_lap_columns(columns, driver_codes, summarize, rows)
         
         for driver_code in driver_codes:
-            try:
-                # Use pick_drivers (newer API) instead of pick_driver
-                driver_laps = race.laps.pick_drivers([driver_code])
-                
-                # Convert to JSON-serializable format
-                laps = []
-                for _, lap in driver_laps.iterrows():
-                    # Check for valid lap time (should be between 60-200 seconds for F1)
-                    if (pd.notna(lap['LapTime']) and 
-                        lap['LapTime'].total_seconds() > 60 and 
-                        lap['LapTime'].total_seconds() < 200):
-                        
-                        laps.append({
-                            "lap": int(lap['LapNumber']),
-                            "time": float(lap['LapTime'].total_seconds()),
-                            "sector1": float(lap['Sector1Time'].total_seconds()) if pd.notna(lap['Sector1Time']) else None,
-                            "sector2": float(lap['Sector2Time'].total_seconds()) if pd.notna(lap['Sector2Time']) else None,
-                            "sector3": float(lap['Sector3Time'].total_seconds()) if pd.notna(lap['Sector3Time']) else None,
-                            "compound": lap.get('Compound', 'Unknown'),
-                            "pit_out_time": lap.get('PitOutTime') is not None,
-                            "pit_in_time": lap.get('PitInTime') is not None
-                        })
-                
-                # Skip drivers with no valid laps
-                if not laps:
-                    logger.warning(f"No valid laps found for driver {driver_code}")
-                    continue
-                
-                # Get driver info
-                driver_info = race.get_driver(driver_code)
-                team_name = driver_info.get('TeamName', 'Unknown')
-                
-                lap_data[driver_code] = {
-                    "driver": {
-                        "code": driver_code,
-                        "name": f"{driver_info.get('FirstName', '')} {driver_info.get('LastName', '')}".strip(),
-                        "team": team_name,
-                        "color": TEAM_COLORS.get(team_name, '#CCCCCC')
-                    },
-                    "laps": laps
-                }
-                
-            except Exception as driver_error:
-                logger.error(f"Error processing driver {driver_code}: {str(driver_error)}")
-                continue
-        
-        return jsonify(lap_data)
+            if driver_code not in lap_data:
+                logger.warning(f"No valid laps found for driver {driver_code}")
+        
+        with phase('serialize'):
+            return jsonify(lap_data)
         
+    except OverBudget as e:
+        return unavailable_response(e, e.retry_after)
     except Exception as e:
         logger.error(f"Error getting lap times: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stints')
+@http_cached
+def get_stints():
+    """Get stints and fuel-corrected tyre degradation for a race"""
+    try:
+        year = int(request.args.get('year'))
+        race_name = request.args.get('race')
+        drivers_param = request.args.get('drivers', 'all')
+        
+        if not all([year, race_name]):
+            return jsonify({"error": "Missing required parameters"}), 400
+        
+        pending = pending_load(year, race_name, 'laps')
+        if pending is not None:
+            return pending
+        
+        # Every stint of the session is fitted at once and cached
+        def compute():
+            columns, _, _, _ = lap_source(year, race_name)
+            with phase('extract'):
+                return stint_table(columns)
+        
+        table = session_cache.derived.get_or_compute(
+            (make_session_key(year, race_name, 'R'), 'stints'), compute)
+        
+        if drivers_param.strip().lower() == 'all':
+            driver_codes = None
+        else:
+            driver_codes = [d.strip() for d in drivers_param.split(',')]
+        
+        with phase('serialize'):
+            return jsonify({
+                "fuel_effect": FUEL_EFFECT,
+                "stints": stint_records(table, driver_codes)
+            })
+    except OverBudget as e:
+        return unavailable_response(e, e.retry_after)
+    except Exception as e:
+        logger.error(f"Error getting stints: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/telemetry')
+@http_cached
 def get_telemetry():
     """Get telemetry data for a specific driver and lap"""
     try:
@@ -203,34 +532,287 @@ def get_telemetry():
         if not all([year, race_name, driver_code, lap_number]):
             return jsonify({"error": "Missing required parameters"}), 400
         
-        # Load race session
-        race = fastf1.get_session(year, race_name, 'R')
-        race.load()
-        
-        # Get specific lap
-        lap = race.laps.pick_driver(driver_code).pick_lap(lap_number)
-        telemetry = lap.get_telemetry()
-        
-        # Convert to JSON-serializable format
-        tel_data = []
-        for _, point in telemetry.iterrows():
-            tel_data.append({
-                "distance": float(point['Distance']),
-                "speed": float(point['Speed']) if pd.notna(point['Speed']) else 0,
-                "throttle": float(point['Throttle']) if pd.notna(point['Throttle']) else 0,
-                "brake": bool(point['Brake']) if pd.notna(point['Brake']) else False
-            })
+        try:
+            fmt = negotiate_format(request.args, request.headers.get('Accept'))
+        except UnsupportedFormat as e:
+            return jsonify({"error": str(e)}), 406
+        
+        # Optional decimation: target sample count or distance bucket (m)
+        points = request.args.get('points', type=int)
+        resolution = request.args.get('resolution', type=float)
         
-        return jsonify({
-            "driver": driver_code,
-            "lap": lap_number,
-            "telemetry": tel_data
-        })
+        pending = pending_load(year, race_name, 'telemetry')
+        if pending is not None:
+            return pending
         
+        columns = lap_telemetry(year, race_name, driver_code, lap_number,
+                                points=points, resolution=resolution)
+        
+        with phase('serialize'):
+            if fmt != 'json':
+                return columnar_response(columns, {"driver": driver_code, "lap": lap_number}, fmt)
+            
+            tel_data = telemetry_records(columns)
+            
+            return jsonify({
+                "driver": driver_code,
+                "lap": lap_number,
+                "telemetry": tel_data
+            })
+        
+    except OverBudget as e:
+        return unavailable_response(e, e.retry_after)
     except Exception as e:
         logger.error(f"Error getting telemetry: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/lap-comparison')
+@http_cached
+def get_lap_comparison():
+    """Compare two laps on a shared distance grid: delta time, speed and mini-sectors"""
+    try:
+        year = int(request.args.get('year'))
+        race_name = request.args.get('race')
+        driver1 = request.args.get('driver1')
+        driver2 = request.args.get('driver2')
+        lap1 = int(request.args.get('lap1'))
+        lap2 = request.args.get('lap2', lap1, type=int)
+        points = request.args.get('points', COMPARISON_POINTS, type=int)
+        sectors = request.args.get('sectors', MINI_SECTORS, type=int)
+        
+        if not all([year, race_name, driver1, driver2, lap1, lap2]):
+            return jsonify({"error": "Missing required parameters"}), 400
+        
+        pending = pending_load(year, race_name, 'telemetry')
+        if pending is not None:
+            return pending
+        
+        source = cached_telemetry_source(year, race_name)
+        
+        def compute():
+            reference = lap_telemetry(year, race_name, driver1, lap1, source=source)
+            comparison = lap_telemetry(year, race_name, driver2, lap2, source=source)
+            with phase('extract'):
+                return compare_laps(reference, comparison, points=points, sectors=sectors)
+        
+        cache_key = (make_session_key(year, race_name, 'R'), 'comparison',
+                     driver1, lap1, driver2, lap2, points, sectors)
+        result = session_cache.derived.get_or_compute(cache_key, compute)
+        
+        with phase('serialize'):
+            return jsonify(comparison_payload(result, (driver1, lap1), (driver2, lap2)))
+        
+    except OverBudget as e:
+        return unavailable_response(e, e.retry_after)
+    except Exception as e:
+        logger.error(f"Error comparing laps: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a background session load"""
+    try:
+        params = request.get_json(silent=True) or request.args
+        year = int(params.get('year'))
+        race_name = params.get('race')
+        if not all([year, race_name]):
+            return jsonify({"error": "Missing required parameters"}), 400
+        job = job_manager.submit(year, race_name, params.get('session', 'R'),
+                                 params.get('tier', 'telemetry'))
+        return job_response(job)
+    except QueueFull as e:
+        return unavailable_response(e)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Poll a background session load"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events')
+def stream_job_events(job_id):
+    """Server-Sent Events with the progress of a background session load"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    since = request.headers.get('Last-Event-ID', 0, type=int)
+    
+    def generate(since):
+        while True:
+            events = job_manager.events(job, since)
+            for event in events:
+                since = event['seq']
+                yield f"id: {since}\nevent: {event['state']}\ndata: {json.dumps(event)}\n\n"
+            if job.done and since >= job.last_seq:
+                break
+            if not events:
+                yield ": keep-alive\n\n"
+    
+    response = Response(generate(since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/live')
+def stream_live_timing():
+    """Server-Sent Events replaying a race's timing as it happened
+    
+    Clients asking for the same race, speed and starting lap share one
+    producer. A 'snapshot' with the standings comes first, then only new
+    sector times, completed laps and position changes. Each client holds a
+    server thread, so past MAX_LIVE_SUBSCRIBERS clients get 503.
+    """
+    try:
+        year = int(request.args.get('year'))
+        race_name = request.args.get('race')
+        from_lap = max(int(request.args.get('from_lap', 1)), 1)
+        if not all([year, race_name]):
+            return jsonify({"error": "Missing required parameters"}), 400
+        try:
+            # Clamped before keying the hub so equivalent speeds share a replay
+            speed = replay_speed(request.args.get('speed', REPLAY_SPEED))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        pending = pending_load(year, race_name, 'laps')
+        if pending is not None:
+            return pending
+        
+        session_key = make_session_key(year, race_name, 'R')
+        def compute():
+            race = session_cache.get(year, race_name, 'R', tier='laps')
+            return replay_timeline(race.laps)
+        
+        timeline = session_cache.derived.get_or_compute((session_key, 'replay'), compute)
+        replay = replay_hub.subscribe((session_key, speed, from_lap), timeline, speed, from_lap)
+    except OverBudget as e:
+        return unavailable_response(e, e.retry_after)
+    except (TooManyReplays, TooManySubscribers) as e:
+        return unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error starting live timing: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    last_event = request.headers.get('Last-Event-ID', type=int)
+    
+    def generate():
+        since, snapshot = replay.snapshot()
+        if last_event is not None and last_event <= since:
+            # Reconnect to the same replay: resume after the last event seen
+            since = last_event
+        else:
+            yield snapshot
+        while True:
+            frames = replay.wait(since)
+            for seq, frame in frames:
+                since = seq
+                yield frame
+            if replay.finished and since >= replay.last_seq:
+                break
+            if not frames:
+                yield ": keep-alive\n\n"
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    # Runs when the client disconnects, even before the first frame
+    response.call_on_close(partial(replay_hub.unsubscribe, replay))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Upper bound on laps returned by one batch request
+MAX_BATCH_LAPS = 200
+
+def parse_lap_requests(spec, limit=MAX_BATCH_LAPS):
+    """Expand 'VER:5,HAM:3-10' (or a list of {driver, lap|laps}) into (driver, lap) pairs
+    
+    A list of laps is taken as exactly those laps. Raises ValueError once
+    the request asks for more than ``limit`` laps, before expanding a range.
+    """
+    if isinstance(spec, str):
+        items = []
+        for part in spec.split(','):
+            if part.strip():
+                driver, _, laps = part.partition(':')
+                items.append({"driver": driver, "laps": laps})
+    else:
+        items = spec or []
+    
+    pairs = []
+    for item in items:
+        driver = str(item['driver']).strip()
+        laps = item.get('laps', item.get('lap'))
+        if isinstance(laps, (list, tuple)):
+            laps = [int(lap) for lap in laps[:limit + 1]]
+        else:
+            start, _, end = str(laps).partition('-')
+            start = int(start)
+            end = int(end) if end else start
+            laps = range(start, end + 1)
+        if len(pairs) + len(laps) > limit:
+            raise ValueError(f"At most {limit} laps per batch")
+        pairs.extend((driver, lap) for lap in laps)
+    return pairs
+
+@app.route('/api/telemetry/batch', methods=['GET', 'POST'])
+def get_telemetry_batch():
+    """Stream telemetry for many (driver, lap) pairs as newline-delimited JSON"""
+    try:
+        params = request.get_json(silent=True) or request.args
+        year = int(params.get('year'))
+        race_name = params.get('race')
+        pairs = parse_lap_requests(params.get('laps'))
+        points = params.get('points')
+        resolution = params.get('resolution')
+        points = int(points) if points else None
+        resolution = float(resolution) if resolution else None
+        
+        if not all([year, race_name, pairs]):
+            return jsonify({"error": "Missing required parameters"}), 400
+        
+        fmt = negotiate_format(params, request.headers.get('Accept'))
+        if fmt not in ('json', 'columnar'):
+            return jsonify({"error": "Batch telemetry supports json and columnar formats"}), 406
+    except UnsupportedFormat as e:
+        return jsonify({"error": str(e)}), 406
+    except (TypeError, ValueError, KeyError) as e:
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    
+    pending = pending_load(year, race_name, 'telemetry')
+    if pending is not None:
+        return pending
+    
+    source = cached_telemetry_source(year, race_name)
+    
+    def generate():
+        for driver_code, lap_number in pairs:
+            try:
+                columns = lap_telemetry(year, race_name, driver_code, lap_number,
+                                        points=points, resolution=resolution, source=source)
+                if fmt == 'columnar':
+                    line = encode_columns(columns, {"driver": driver_code, "lap": lap_number}, fmt)
+                else:
+                    line = json.dumps({
+                        "driver": driver_code,
+                        "lap": lap_number,
+                        "telemetry": telemetry_records(columns)
+                    }).encode('utf-8')
+            except Exception as e:
+                logger.error(f"Error getting telemetry for {driver_code} lap {lap_number}: {str(e)}")
+                line = json.dumps({"driver": driver_code, "lap": lap_number, "error": str(e)}).encode('utf-8')
+            yield line + b'\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Lines may carry per-lap errors, so a batch is never cached
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+metrics.record_startup('app_ready', time.time() - metrics.PROCESS_STARTED)
+logger.info(f"API ready {metrics.startup_times()['app_ready']:.2f}s after process start")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
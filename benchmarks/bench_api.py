@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Offline API benchmark
+Drives the Flask endpoints through the test client against synthetic
+sessions and reports latency percentiles, peak RSS and payload sizes, plus
+the cold import time of app.py with its slowest imports
+
+    python benchmarks/bench_api.py --output bench.json
+    python benchmarks/bench_api.py --compare bench.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import logging
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Isolated cache/store and synchronous loads, set before the app is imported
+WORK_DIR = tempfile.mkdtemp(prefix='f1-bench-')
+os.environ['F1_CACHE_DIR'] = os.path.join(WORK_DIR, 'cache')
+os.environ.setdefault('ASYNC_LOADS', '0')
+
+import fixtures  # noqa: E402
+
+YEAR = 2023
+RACE = fixtures.EVENTS[0]
+
+# Latency differences below this are treated as noise when comparing runs
+MIN_DELTA_MS = 1.0
+
+# Modules that must not be imported before the first data request
+DEFERRED_MODULES = ('fastf1', 'pandas', 'matplotlib', 'pyarrow')
+_STARTUP_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+seconds = time.perf_counter() - started
+deferred = [m for m in {DEFERRED_MODULES!r} if m in sys.modules]
+# Revalidating a past season must be answered without the deferred imports
+from http_cache import request_etag
+with app.app.test_request_context('/api/races/2020'):
+    etag = request_etag()
+status = app.app.test_client().get('/api/races/2020', headers={{"If-None-Match": f'"{{etag}}"'}}).status_code
+print(json.dumps({{"seconds": seconds, "deferred": deferred, "revalidation_status": status,
+                  "deferred_after_304": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, else peak)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenarios(iterations):
+    """(name, urls, reset) tuples; ``reset`` drops cached sessions before each request"""
+    race = RACE.replace(' ', '%20')
+    base = f"year={YEAR}&race={race}"
+    telemetry = [f"/api/telemetry?{base}&driver=D{i % 20 + 1:02d}&lap={i % 70 + 1}"
+                 for i in range(iterations)]
+    return [
+        ('races', [f"/api/races/{YEAR}"] * iterations, False),
+        ('drivers', [f"/api/drivers/{YEAR}/{race}"] * iterations, False),
+        ('lap_times_cold', [f"/api/lap-times?{base}&drivers=all"] * max(3, iterations // 10), True),
+        ('lap_times_all', [f"/api/lap-times?{base}&drivers=all"] * iterations, False),
+        ('lap_times_two', [f"/api/lap-times?{base}&drivers=D01,D02"] * iterations, False),
+        ('lap_times_binary', [f"/api/lap-times?{base}&drivers=all&format=binary"] * iterations, False),
+        ('telemetry_cold', telemetry[:max(3, iterations // 10)], True),
+        ('telemetry_full', telemetry, False),
+        ('telemetry_600', [url + "&points=600" for url in telemetry], False),
+        ('telemetry_cached', [telemetry[0] + "&points=600"] * iterations, False)
+    ]
+
+
+def reset_caches(app_module):
+    """Forget every loaded session, derived result and stored session"""
+    app_module.session_cache.clear()
+    app_module.session_store.invalidate()
+
+
+def run_scenario(client, app_module, urls, reset):
+    latencies = []
+    sizes = []
+    errors = 0
+    for url in urls:
+        if reset:
+            reset_caches(app_module)
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(response.data))
+        if response.status_code != 200:
+            errors += 1
+    latencies = np.array(latencies)
+    return {
+        "requests": len(urls),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "payload_bytes": int(np.median(sizes)),
+        "rss_mb": round(current_rss_mb(), 1)
+    }
+
+
+def measure_startup(runs=3):
+    """Import app.py in fresh interpreters: best wall time and per-import breakdown
+
+    The breakdown lists the modules app.py imports directly with their
+    cumulative import time (``python -X importtime``), slowest first.
+    """
+    env = dict(os.environ, WARM_IMPORTS='0')
+    best = None
+    imports = {}
+    deferred = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT],
+                                cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        summary = json.loads(result.stdout.strip().splitlines()[-1])
+        best = min(best, summary['seconds']) if best is not None else summary['seconds']
+        deferred = summary['deferred']
+        revalidation = {"status": summary['revalidation_status'],
+                        "deferred_loaded": summary['deferred_after_304']}
+        # "import time: self [us] | cumulative | <indent>module", two spaces per level
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            name = fields[2][1:]
+            if name.startswith('  ') and not name.startswith('    '):
+                module = name.strip()
+                ms = int(fields[1]) / 1000
+                imports[module] = min(imports.get(module, ms), ms)
+    slowest = sorted(imports.items(), key=lambda item: -item[1])[:10]
+    return {
+        "import_ms": round(best * 1000, 1),
+        "imports_ms": {module: round(ms, 1) for module, ms in slowest},
+        "deferred_loaded": deferred,
+        "revalidation": revalidation
+    }
+
+
+def run_benchmarks(iterations=50, only=None):
+    """Run every scenario (or those named in ``only``) and return the report"""
+    fixtures.install()
+    import app as app_module
+    logging.getLogger().setLevel(logging.WARNING)
+    client = app_module.app.test_client()
+
+    # Build the synthetic session outside of any timed request
+    import fastf1
+    fastf1.get_session(YEAR, RACE, 'R')
+
+    startup = None
+    if not only or 'startup' in only:
+        startup = measure_startup()
+        print(f"{'startup':18s} import {startup['import_ms']:9.2f} ms  "
+              + ', '.join(f"{module} {ms:.0f}" for module, ms in list(startup['imports_ms'].items())[:5]))
+        if startup['deferred_loaded']:
+            print(f"WARNING importing app loads {', '.join(startup['deferred_loaded'])}")
+        revalidation = startup['revalidation']
+        if revalidation['status'] != 304 or revalidation['deferred_loaded']:
+            print(f"WARNING revalidating a past season answered {revalidation['status']} "
+                  f"and loaded {', '.join(revalidation['deferred_loaded']) or 'nothing'}")
+
+    results = {}
+    for name, urls, reset in scenarios(iterations):
+        if only and name not in only:
+            continue
+        results[name] = run_scenario(client, app_module, urls, reset)
+        print(f"{name:18s} p50 {results[name]['p50_ms']:9.2f} ms  "
+              f"p95 {results[name]['p95_ms']:9.2f} ms  "
+              f"{results[name]['payload_bytes']:>9d} B  "
+              f"errors {results[name]['errors']}")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "python": platform.python_version(),
+            "fastf1": fastf1.__version__,
+            "iterations": iterations
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "startup": startup,
+        "results": results
+    }
+
+
+def compare(report, baseline, threshold=0.25, min_delta_ms=MIN_DELTA_MS):
+    """Regressions of ``report`` against ``baseline`` as readable strings
+
+    Latency (p50/p95) regresses when it grows by more than ``threshold``
+    (fraction) and ``min_delta_ms``; payload size and peak RSS when they
+    grow by more than ``threshold``.
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            old, new = before[metric], result[metric]
+            if new > old * (1 + threshold) and new - old > min_delta_ms:
+                regressions.append(f"{name} {metric}: {old:.2f} -> {new:.2f}")
+        old, new = before['payload_bytes'], result['payload_bytes']
+        if new > old * (1 + threshold):
+            regressions.append(f"{name} payload_bytes: {old} -> {new}")
+
+    before, after = baseline.get('startup'), report.get('startup')
+    if before and after:
+        old, new = before['import_ms'], after['import_ms']
+        if new > old * (1 + threshold) and new - old > min_delta_ms:
+            regressions.append(f"startup import_ms: {old:.1f} -> {new:.1f}")
+
+    old, new = baseline.get('peak_rss_mb'), report['peak_rss_mb']
+    if old and new > old * (1 + threshold):
+        regressions.append(f"peak_rss_mb: {old} -> {new}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the F1 API offline on synthetic sessions')
+    parser.add_argument('--iterations', type=int, default=50, help='Requests per scenario')
+    parser.add_argument('--scenarios', default='', help='Comma-separated scenario names (default: all)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed relative growth before a metric counts as regressed')
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS,
+                        help='Ignore latency changes smaller than this')
+    args = parser.parse_args(argv)
+
+    only = {name.strip() for name in args.scenarios.split(',') if name.strip()}
+    try:
+        report = run_benchmarks(args.iterations, only)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+    print(f"peak RSS {report['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {baseline['meta'].get('commit') or args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Synthetic FastF1 sessions and schedules for offline benchmarks
+Realistically sized (20 drivers, ~70 laps, ~700 car samples per lap) and
+built with the real fastf1.core containers, so the API code paths are the
+same as with downloaded data
+"""
+
+import numpy as np
+import pandas as pd
+import fastf1
+from fastf1 import core, events
+
+TEAMS = ['Red Bull Racing', 'Ferrari', 'Mercedes', 'McLaren', 'Aston Martin',
+         'Alpine', 'Williams', 'RB', 'Kick Sauber', 'Haas F1 Team']
+EVENTS = ['Bahrain Grand Prix', 'Saudi Arabian Grand Prix', 'Australian Grand Prix',
+          'Japanese Grand Prix', 'Chinese Grand Prix', 'Miami Grand Prix']
+
+
+class SyntheticSession:
+    """Session-like object with laps, results and car/position data
+
+    ``load()`` is a no-op: everything is generated up front, so cold
+    benchmark runs measure the API rather than the fixture.
+    """
+
+    def __init__(self, year=2023, event_name=EVENTS[0], n_drivers=20, n_laps=70,
+                 samples_per_lap=700, seed=0):
+        rng = np.random.default_rng(seed)
+        self.name = 'Race'
+        self.event = pd.Series({'EventName': event_name, 'RoundNumber': 1, 'Year': year})
+        self.t0_date = pd.Timestamp(f'{year}-03-05 15:00')
+        self.drivers = [str(number) for number in range(1, n_drivers + 1)]
+        abbreviations = [f"D{number:02d}" for number in range(1, n_drivers + 1)]
+
+        self._results = core.SessionResults(pd.DataFrame({
+            'DriverNumber': self.drivers,
+            'Abbreviation': abbreviations,
+            'FirstName': ['Driver'] * n_drivers,
+            'LastName': abbreviations,
+            'TeamName': [TEAMS[i // 2 % len(TEAMS)] for i in range(n_drivers)],
+            'Position': np.arange(1, n_drivers + 1, dtype=float)
+        }, index=self.drivers))
+
+        laps = []
+        self._car_data = {}
+        self._pos_data = {}
+        lap_number = np.arange(1, n_laps + 1, dtype=float)
+        pit_lap = n_laps // 2
+        # Car and position data of all drivers share one grid covering the race
+        n = samples_per_lap * n_laps
+        session_time = pd.to_timedelta(np.linspace(0, n_laps * 95.0 + 60, n), unit='s')
+        frame = {'Date': self.t0_date + session_time, 'SessionTime': session_time,
+                 'Time': session_time}
+        for number, abbreviation in zip(self.drivers, abbreviations):
+            lap_seconds = 92 + rng.normal(0, 0.6, n_laps) + np.where(lap_number == 1, 8, 0)
+            lap_end = np.cumsum(lap_seconds)
+            lap_start = lap_end - lap_seconds
+            sectors = lap_seconds[:, None] * np.array([0.31, 0.38, 0.31])
+            laps.append(pd.DataFrame({
+                'Time': pd.to_timedelta(lap_end, unit='s'),
+                'Driver': abbreviation,
+                'DriverNumber': number,
+                'LapTime': pd.to_timedelta(lap_seconds, unit='s'),
+                'LapNumber': lap_number,
+                'Stint': np.where(lap_number <= pit_lap, 1.0, 2.0),
+                'PitOutTime': pd.to_timedelta(np.where(lap_number == pit_lap + 1, lap_start, np.nan), unit='s'),
+                'PitInTime': pd.to_timedelta(np.where(lap_number == pit_lap, lap_end, np.nan), unit='s'),
+                'Sector1Time': pd.to_timedelta(sectors[:, 0], unit='s'),
+                'Sector2Time': pd.to_timedelta(sectors[:, 1], unit='s'),
+                'Sector3Time': pd.to_timedelta(sectors[:, 2], unit='s'),
+                'Compound': np.where(lap_number <= pit_lap, 'SOFT', 'HARD'),
+                'TyreLife': np.where(lap_number <= pit_lap, lap_number, lap_number - pit_lap),
+                'LapStartTime': pd.to_timedelta(lap_start, unit='s'),
+                'Position': rng.integers(1, n_drivers + 1, n_laps).astype(float),
+                'Team': self._results.loc[number, 'TeamName'],
+                'IsAccurate': True,
+                'Deleted': False
+            }))
+
+            self._car_data[number] = core.Telemetry(pd.DataFrame({
+                **frame,
+                'Speed': rng.uniform(80, 330, n),
+                'RPM': rng.uniform(8000, 12000, n),
+                'nGear': rng.integers(1, 9, n),
+                'Throttle': rng.uniform(0, 100, n),
+                'Brake': rng.random(n) > 0.8,
+                'DRS': np.zeros(n, dtype=int),
+                'Source': 'car'
+            }), session=self, driver=number)
+            self._pos_data[number] = core.Telemetry(pd.DataFrame({
+                **frame,
+                'X': rng.uniform(-1000, 1000, n),
+                'Y': rng.uniform(-1000, 1000, n),
+                'Z': np.zeros(n),
+                'Status': 'OnTrack',
+                'Source': 'pos'
+            }), session=self, driver=number)
+
+        self._laps = core.Laps(pd.concat(laps, ignore_index=True), session=self)
+
+    laps = property(lambda self: self._laps)
+    results = property(lambda self: self._results)
+    car_data = property(lambda self: self._car_data)
+    pos_data = property(lambda self: self._pos_data)
+
+    def get_driver(self, identifier):
+        results = self._results
+        by_code = results[results['Abbreviation'] == identifier]
+        return by_code.iloc[0] if len(by_code) else results.loc[identifier]
+
+    def load(self, **kwargs):
+        pass
+
+
+def synthetic_schedule(year=2023, event_names=EVENTS):
+    """EventSchedule with one conventional weekend per event name"""
+    rounds = []
+    for round_number, name in enumerate(event_names, start=1):
+        race_day = pd.Timestamp(f'{year}-03-05') + pd.Timedelta(weeks=2 * (round_number - 1))
+        row = {
+            'RoundNumber': round_number,
+            'Country': name.replace(' Grand Prix', ''),
+            'Location': name.replace(' Grand Prix', ''),
+            'OfficialEventName': f"FORMULA 1 {name.upper()} {year}",
+            'EventDate': race_day,
+            'EventName': name,
+            'EventFormat': 'conventional',
+            'F1ApiSupport': True
+        }
+        sessions = [('Practice 1', -2, 11), ('Practice 2', -2, 15), ('Practice 3', -1, 12),
+                    ('Qualifying', -1, 15), ('Race', 0, 15)]
+        for i, (session_name, day, hour) in enumerate(sessions, start=1):
+            date = race_day + pd.Timedelta(days=day, hours=hour)
+            row[f'Session{i}'] = session_name
+            row[f'Session{i}Date'] = date
+            row[f'Session{i}DateUtc'] = date
+        rounds.append(row)
+    return events.EventSchedule(pd.DataFrame(rounds), year=year)
+
+
+def install(monkeypatch_target=fastf1, **session_kwargs):
+    """Replace fastf1.get_session/get_event_schedule with synthetic data
+
+    Sessions are built once per (year, event) and reused, like a warm
+    FastF1 disk cache. Returns a function restoring the originals.
+    """
+    originals = (monkeypatch_target.get_session, monkeypatch_target.get_event_schedule)
+    sessions = {}
+
+    def get_session(year, gp, identifier=None, **kwargs):
+        key = (int(year), str(gp).lower(), identifier)
+        if key not in sessions:
+            name = EVENTS[int(gp) - 1] if str(gp).isdigit() else str(gp)
+            sessions[key] = SyntheticSession(year=int(year), event_name=name,
+                                             seed=len(sessions), **session_kwargs)
+        return sessions[key]
+
+    def get_event_schedule(year, **kwargs):
+        return synthetic_schedule(int(year))
+
+    monkeypatch_target.get_session = get_session
+    monkeypatch_target.get_event_schedule = get_event_schedule
+
+    def restore():
+        monkeypatch_target.get_session, monkeypatch_target.get_event_schedule = originals
+    return restore
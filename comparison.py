@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Distance-aligned comparison of two laps
+Both laps are resampled onto one distance grid, so delta time, speed
+difference and mini-sector splits are plain array arithmetic
+"""
+
+import numpy as np
+
+from downsample import MIN_RESOLUTION, resample_distance
+
+# Grid points across the compared distance and mini-sectors per lap
+COMPARISON_POINTS = 400
+MAX_COMPARISON_POINTS = 2000
+MINI_SECTORS = 25
+MAX_MINI_SECTORS = 100
+# Floor on speed (km/h) when integrating time, so stationary samples stay finite
+MIN_SPEED = 1.0
+
+
+def elapsed_time(distance, speed):
+    """Time (s) to reach every distance sample, integrated from speed
+
+    Uses the mean speed between neighbouring samples; the distance before
+    the first sample is covered at the first sample's speed.
+    """
+    v = np.maximum(np.asarray(speed, dtype=float), MIN_SPEED) / 3.6
+    if not len(v):
+        return np.zeros(0)
+    dt = np.diff(distance) / ((v[1:] + v[:-1]) / 2)
+    return np.concatenate(([distance[0] / v[0]], distance[0] / v[0] + np.cumsum(dt)))
+
+
+def compare_laps(reference, comparison, points=COMPARISON_POINTS, sectors=MINI_SECTORS):
+    """Delta trace of ``comparison`` against ``reference`` (telemetry columns)
+
+    Returns a dict of ``distance``, ``delta`` (cumulative time lost by the
+    comparison lap, s), ``speed_diff`` (comparison minus reference, km/h),
+    both speed traces and ``sectors``: start/end distance and time of each
+    lap over ``sectors`` mini-sectors of equal length.
+    """
+    length = min(reference['distance'][-1], comparison['distance'][-1]) \
+        if len(reference['distance']) and len(comparison['distance']) else 0.0
+    if length <= 0:
+        raise ValueError("No telemetry to compare")
+
+    step = max(length / min(int(points), MAX_COMPARISON_POINTS), MIN_RESOLUTION)
+    channels = ('distance', 'speed')
+    ref = resample_distance({name: reference[name] for name in channels}, step)
+    other = resample_distance({name: comparison[name] for name in channels}, step)
+    # Both grids are multiples of the step, so they only differ at the ends
+    n = min(len(ref['distance']), len(other['distance']))
+    if n < 2:
+        raise ValueError("Laps too short to compare")
+    distance = ref['distance'][:n]
+    ref_speed, other_speed = ref['speed'][:n], other['speed'][:n]
+
+    ref_time = elapsed_time(distance, ref_speed)
+    other_time = elapsed_time(distance, other_speed)
+
+    sectors = max(1, min(int(sectors), MAX_MINI_SECTORS, n - 1))
+    edges = np.linspace(0, n - 1, sectors + 1).astype(int)
+    start, end = edges[:-1], edges[1:]
+    return {
+        "distance": distance,
+        "delta": other_time - ref_time,
+        "speed_diff": other_speed - ref_speed,
+        "reference_speed": ref_speed,
+        "comparison_speed": other_speed,
+        "reference_time": ref_time[-1],
+        "comparison_time": other_time[-1],
+        "sectors": {
+            "start": distance[start],
+            "end": distance[end],
+            "reference_time": ref_time[end] - ref_time[start],
+            "comparison_time": other_time[end] - other_time[start]
+        }
+    }
+
+
+def comparison_payload(result, reference, comparison):
+    """JSON-ready comparison; ``reference``/``comparison`` are (driver, lap)"""
+    sectors = result['sectors']
+    sector_delta = sectors['comparison_time'] - sectors['reference_time']
+    return {
+        "reference": {"driver": reference[0], "lap": reference[1],
+                      "time": round(float(result['reference_time']), 3)},
+        "comparison": {"driver": comparison[0], "lap": comparison[1],
+                       "time": round(float(result['comparison_time']), 3)},
+        "distance": np.round(result['distance'], 1).tolist(),
+        "delta": np.round(result['delta'], 3).tolist(),
+        "speed_diff": np.round(result['speed_diff'], 1).tolist(),
+        "reference_speed": np.round(result['reference_speed'], 1).tolist(),
+        "comparison_speed": np.round(result['comparison_speed'], 1).tolist(),
+        "sectors": [
+            {
+                "sector": i + 1,
+                "start": start,
+                "end": end,
+                "reference_time": reference_time,
+                "comparison_time": comparison_time,
+                "delta": delta,
+                "faster": reference[0] if delta > 0 else comparison[0]
+            }
+            for i, (start, end, reference_time, comparison_time, delta) in enumerate(zip(
+                np.round(sectors['start'], 1).tolist(),
+                np.round(sectors['end'], 1).tolist(),
+                np.round(sectors['reference_time'], 3).tolist(),
+                np.round(sectors['comparison_time'], 3).tolist(),
+                np.round(sector_delta, 3).tolist()
+            ))
+        ]
+    }
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Size-bounded management of the on-disk cache
+Tracks FastF1's per-session pickle directories and the session store under one
+cache root, evicts whole sessions (least recently used or least popular first)
+once the root grows past a byte budget, and optionally compacts cold historical
+sessions into one compressed archive that is restored on the next load
+
+Usage:
+    python disk_cache.py stats
+    python disk_cache.py enforce --max-gb 20 --policy lru --compact-days 30 [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+import zipfile
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Cache root shared by the API server, the Streamlit app and the offline tools
+CACHE_DIR = os.environ.get('F1_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache'))
+
+# Byte budget for the whole cache root (0 disables eviction)
+FASTF1_CACHE_MAX_GB = float(os.environ.get('FASTF1_CACHE_MAX_GB', 20))
+# 'lru' evicts the least recently used sessions, 'popular' the least requested
+FASTF1_CACHE_POLICY = os.environ.get('FASTF1_CACHE_POLICY', 'lru')
+# Compact sessions older than this many days and unused as long (0 disables)
+FASTF1_CACHE_COMPACT_DAYS = int(os.environ.get('FASTF1_CACHE_COMPACT_DAYS', 0))
+# Seconds between automatic enforcement passes after session loads
+ENFORCE_INTERVAL = 300
+# Sessions used this recently are never evicted or compacted (loads may be running)
+MIN_IDLE = 600
+# Seconds between writes of this process's access counts to the usage file
+FLUSH_INTERVAL = 60
+
+POLICIES = ('lru', 'popular')
+USAGE_FILE = 'cache_usage.json'
+HTTP_CACHE_FILE = 'fastf1_http_cache.sqlite'
+ARCHIVE_NAME = 'session.ff1.zip'
+STORE_DIR_NAME = 'store'
+_PICKLE_SUFFIX = '.ff1pkl'
+_DATE_PREFIX = re.compile(r'^(\d{4}-\d{2}-\d{2})_')
+
+
+def _session_date(relative):
+    """Date of a FastF1 session directory from its name, e.g. '2023-03-05_Race'"""
+    for part in reversed(relative.split('/')):
+        match = _DATE_PREFIX.match(part)
+        if match:
+            try:
+                return datetime.strptime(match.group(1), '%Y-%m-%d')
+            except ValueError:
+                return None
+    return None
+
+
+def compact_directory(directory):
+    """Pack a session's FastF1 pickles into one deflated zip, returns bytes saved"""
+    names = sorted(name for name in os.listdir(directory) if name.endswith(_PICKLE_SUFFIX))
+    if not names:
+        return 0
+    before = sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    tmp_path = f"{archive}.{uuid.uuid4().hex}"
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as z:
+        for name in names:
+            z.write(os.path.join(directory, name), name)
+    os.replace(tmp_path, archive)
+    for name in names:
+        os.remove(os.path.join(directory, name))
+    return before - os.path.getsize(archive)
+
+
+def restore_directory(directory):
+    """Unpack a compacted session so FastF1 can read it, returns True if it was compacted"""
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    try:
+        with zipfile.ZipFile(archive) as z:
+            for name in z.namelist():
+                target = os.path.join(directory, os.path.basename(name))
+                if os.path.exists(target):
+                    continue
+                tmp_path = f"{target}.{uuid.uuid4().hex}"
+                with z.open(name) as src, open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, target)
+        os.remove(archive)
+    except FileNotFoundError:
+        # Not compacted, or another process restored it first
+        return False
+    return True
+
+
+class DiskCache:
+    """Budget, eviction, compaction and statistics of one cache root
+
+    Sessions are the unit of eviction: a FastF1 session directory (every
+    directory holding ``.ff1pkl`` files or an archive) or a session in the
+    store (``store/<year>/<race>/<session>``). Access times and request
+    counts are kept in ``cache_usage.json`` and the directory mtime, so all
+    processes sharing the root see each other's use.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=int(FASTF1_CACHE_MAX_GB * 1024 ** 3),
+                 policy=FASTF1_CACHE_POLICY, compact_days=FASTF1_CACHE_COMPACT_DAYS):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.compact_days = compact_days
+        self._access = {}  # relative path -> [last access, requests] not yet written
+        self._lock = threading.Lock()
+        self._last_enforce = 0.0
+        self._last_flush = time.time()
+        self._enforcing = False
+        self._last_scan = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compactions = 0
+        self.restores = 0
+        self.bytes_freed = 0
+
+    def use_root(self, root):
+        with self._lock:
+            self.root = root
+            self._access = {}
+
+    def _relative(self, directory):
+        relative = os.path.relpath(os.path.abspath(directory), os.path.abspath(self.root))
+        return None if relative.startswith('..') else relative.replace(os.sep, '/')
+
+    def fastf1_session_dir(self, session):
+        """Directory FastF1 caches a session in (mirrors Cache._get_cache_file_path)"""
+        api_path = getattr(session, 'api_path', None)
+        if not api_path:
+            return None
+        return os.path.join(self.root, *api_path[len('/static/'):].strip('/').split('/'))
+
+    def record_access(self, directory):
+        """Count a use of a session directory (written out on the next flush)"""
+        relative = self._relative(directory)
+        if relative is None:
+            return
+        with self._lock:
+            entry = self._access.setdefault(relative, [0.0, 0])
+            entry[0] = time.time()
+            entry[1] += 1
+            due = entry[0] - self._last_flush > FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def before_load(self, session):
+        """Restore a compacted session and count a disk hit/miss before FastF1 loads it"""
+        directory = self.fastf1_session_dir(session)
+        if directory is None:
+            return
+        try:
+            if restore_directory(directory):
+                with self._lock:
+                    self.restores += 1
+                logger.info(f"Restored compacted FastF1 cache {directory}")
+            cached = os.path.isdir(directory) and any(
+                name.endswith(_PICKLE_SUFFIX) for name in os.listdir(directory))
+            if cached:
+                # Marks the session as in use for other processes' eviction passes
+                os.utime(directory)
+        except OSError as e:
+            logger.warning(f"Could not inspect FastF1 cache {directory}: {e}")
+            cached = False
+        with self._lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.record_access(directory)
+
+    def _read_usage(self):
+        try:
+            with open(os.path.join(self.root, USAGE_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_usage(self, usage):
+        path = os.path.join(self.root, USAGE_FILE)
+        tmp_path = f"{path}.{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as f:
+            json.dump(usage, f)
+        os.replace(tmp_path, path)
+
+    def flush(self, forget=()):
+        """Merge this process's access counts into the usage file"""
+        with self._lock:
+            pending, self._access = self._access, {}
+            self._last_flush = time.time()
+        if not pending and not forget:
+            return
+        usage = self._read_usage()
+        for relative, (last_access, requests) in pending.items():
+            record = usage.setdefault(relative, {"last_access": 0.0, "requests": 0})
+            record['last_access'] = max(record['last_access'], last_access)
+            record['requests'] += requests
+        for relative in forget:
+            usage.pop(relative, None)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            self._write_usage(usage)
+        except OSError as e:
+            logger.warning(f"Could not write cache usage: {e}")
+
+    def scan(self):
+        """Sessions on disk with their size and use, plus totals by kind"""
+        units = {}
+        totals = {"fastf1": 0, "store": 0, "http": 0, "other": 0}
+        for directory, _, names in os.walk(self.root):
+            relative = self._relative(directory)
+            parts = [] if relative == '.' else relative.split('/')
+            for name in names:
+                try:
+                    size = os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    continue
+                if parts[:1] == [STORE_DIR_NAME] and len(parts) >= 4:
+                    kind, path, season = 'store', '/'.join(parts[:4]), parts[1]
+                elif name.endswith(_PICKLE_SUFFIX) or name == ARCHIVE_NAME:
+                    kind, path, season = 'fastf1', relative, parts[0] if parts else ''
+                else:
+                    totals['http' if name.startswith(HTTP_CACHE_FILE) else 'other'] += size
+                    continue
+                totals[kind] += size
+                unit = units.setdefault(path, {"path": path, "kind": kind, "season": season,
+                                               "bytes": 0, "files": 0, "compacted": False})
+                unit['bytes'] += size
+                unit['files'] += 1
+                unit['compacted'] = unit['compacted'] or name == ARCHIVE_NAME
+
+        usage = self._read_usage()
+        with self._lock:
+            pending = dict(self._access)
+        for path, unit in units.items():
+            record = usage.get(path, {})
+            try:
+                modified = os.path.getmtime(os.path.join(self.root, path))
+            except OSError:
+                modified = 0.0
+            unit['last_access'] = max(record.get('last_access', 0.0), pending.get(path, [0.0])[0], modified)
+            unit['requests'] = record.get('requests', 0) + pending.get(path, [0, 0])[1]
+            date = _session_date(path) if unit['kind'] == 'fastf1' else None
+            unit['date'] = date.strftime('%Y-%m-%d') if date else None
+
+        totals['bytes'] = sum(totals.values())
+        self._last_scan = {**totals, "sessions": len(units), "scanned_at": time.time()}
+        return list(units.values()), totals
+
+    def _eviction_order(self, units):
+        if self.policy == 'popular':
+            return sorted(units, key=lambda u: (u['requests'], u['last_access']))
+        return sorted(units, key=lambda u: u['last_access'])
+
+    def _remove(self, unit):
+        directory = os.path.join(self.root, unit['path'])
+        shutil.rmtree(directory, ignore_errors=True)
+        # Drop the event/season directories left empty
+        parent = os.path.dirname(directory)
+        while self._relative(parent) not in (None, '.', STORE_DIR_NAME):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+    def enforce(self, dry_run=False):
+        """Compact cold sessions, then evict until the root fits the budget
+
+        Returns the compacted and evicted session paths and the sizes before
+        and after.
+        """
+        self.flush()
+        units, totals = self.scan()
+        now = time.time()
+        idle = [u for u in units if now - u['last_access'] > MIN_IDLE]
+        total = totals['bytes']
+        result = {"bytes_before": total, "compacted": [], "evicted": [], "dry_run": dry_run}
+
+        if self.compact_days:
+            cutoff = now - self.compact_days * 86400
+            for unit in idle:
+                date = _session_date(unit['path']) if unit['kind'] == 'fastf1' else None
+                if (unit['compacted'] or date is None or date.timestamp() > cutoff
+                        or unit['last_access'] > cutoff):
+                    continue
+                saved = 0
+                if not dry_run:
+                    try:
+                        saved = compact_directory(os.path.join(self.root, unit['path']))
+                    except (OSError, zipfile.BadZipFile) as e:
+                        logger.warning(f"Could not compact {unit['path']}: {e}")
+                        continue
+                    with self._lock:
+                        self.compactions += 1
+                        self.bytes_freed += saved
+                unit['bytes'] -= saved
+                unit['compacted'] = True
+                total -= saved
+                result['compacted'].append({"path": unit['path'], "saved": saved})
+
+        if self.max_bytes:
+            evicted = []
+            for unit in self._eviction_order(idle):
+                if total <= self.max_bytes:
+                    break
+                if not dry_run:
+                    self._remove(unit)
+                    with self._lock:
+                        self.evictions += 1
+                        self.bytes_freed += unit['bytes']
+                total -= unit['bytes']
+                evicted.append(unit['path'])
+                result['evicted'].append({"path": unit['path'], "bytes": unit['bytes']})
+            if evicted and not dry_run:
+                self.flush(forget=evicted)
+                logger.info(f"Evicted {len(evicted)} cached session(s) to fit "
+                            f"{self.max_bytes / 1024 ** 3:.1f} GB")
+            if total > self.max_bytes:
+                logger.warning(f"Disk cache still {total / 1024 ** 3:.1f} GB after eviction "
+                               f"(sessions in use and the HTTP cache are kept)")
+
+        result['bytes_after'] = total
+        with self._lock:
+            self._last_enforce = now
+        return result
+
+    def maybe_enforce(self):
+        """Run enforce() in the background at most every ENFORCE_INTERVAL seconds"""
+        if not (self.max_bytes or self.compact_days):
+            return
+        with self._lock:
+            if self._enforcing or time.time() - self._last_enforce < ENFORCE_INTERVAL:
+                return
+            self._enforcing = True
+            self._last_enforce = time.time()
+        threading.Thread(target=self._background_enforce, name='disk-cache-enforce',
+                         daemon=True).start()
+
+    def _background_enforce(self):
+        try:
+            self.enforce()
+        except Exception as e:
+            logger.error(f"Disk cache enforcement failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._enforcing = False
+
+    def counters(self):
+        """Counters and the totals of the last scan, without walking the disk"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "compactions": self.compactions,
+                "restores": self.restores,
+                "bytes_freed": self.bytes_freed,
+                "last_scan": dict(self._last_scan)
+            }
+
+    def stats(self):
+        """Sizes per season and session plus load hit rates"""
+        units, totals = self.scan()
+        seasons = {}
+        for unit in units:
+            season = seasons.setdefault(unit['season'], {"bytes": 0, "fastf1": 0, "store": 0,
+                                                         "sessions": 0, "stored": 0, "compacted": 0})
+            season['bytes'] += unit['bytes']
+            season[unit['kind']] += unit['bytes']
+            season['sessions' if unit['kind'] == 'fastf1' else 'stored'] += 1
+            season['compacted'] += unit['compacted']
+        now = time.time()
+        return {
+            "root": os.path.abspath(self.root),
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+            "compact_days": self.compact_days,
+            **totals,
+            **self.counters(),
+            "seasons": dict(sorted(seasons.items())),
+            "sessions": [
+                {**unit, "last_access": None if not unit['last_access']
+                    else datetime.fromtimestamp(unit['last_access'], timezone.utc).isoformat(timespec='seconds'),
+                 "idle": round(now - unit['last_access']) if unit['last_access'] else None}
+                for unit in sorted(units, key=lambda u: u['bytes'], reverse=True)
+            ]
+        }
+
+
+def _format_bytes(n):
+    return f"{n / 1024 ** 2:,.1f} MB" if n < 1024 ** 3 else f"{n / 1024 ** 3:,.2f} GB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and bound the FastF1/session store disk cache")
+    parser.add_argument('command', choices=('stats', 'enforce'))
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--max-gb', type=float, default=FASTF1_CACHE_MAX_GB,
+                        help="Byte budget in GB (0 disables eviction)")
+    parser.add_argument('--policy', choices=POLICIES, default=FASTF1_CACHE_POLICY)
+    parser.add_argument('--compact-days', type=int, default=FASTF1_CACHE_COMPACT_DAYS,
+                        help="Compact sessions older and unused for this many days (0 disables)")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what enforce would do")
+    parser.add_argument('--json', action='store_true', help="Print the raw JSON report")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    cache = DiskCache(args.cache_dir, int(args.max_gb * 1024 ** 3), args.policy, args.compact_days)
+    report = cache.stats() if args.command == 'stats' else cache.enforce(dry_run=args.dry_run)
+    if args.json:
+        print(json.dumps(report, indent=1))
+    elif args.command == 'stats':
+        print(f"{report['root']}: {_format_bytes(report['bytes'])} "
+              f"(budget {_format_bytes(report['max_bytes']) if report['max_bytes'] else 'none'})")
+        print(f"  FastF1 {_format_bytes(report['fastf1'])}, store {_format_bytes(report['store'])}, "
+              f"HTTP cache {_format_bytes(report['http'])}, other {_format_bytes(report['other'])}")
+        for season, row in report['seasons'].items():
+            print(f"  {season or '-':<8} {_format_bytes(row['bytes']):>12}  "
+                  f"{row['sessions']} FastF1 session(s), {row['compacted']} compacted, "
+                  f"{row['stored']} in the store")
+    else:
+        prefix = "Would free" if args.dry_run else "Freed"
+        print(f"{prefix} {_format_bytes(report['bytes_before'] - report['bytes_after'])}: "
+              f"{len(report['compacted'])} compacted, {len(report['evicted'])} evicted, "
+              f"{_format_bytes(report['bytes_after'])} left")
+    return 0
+
+
+# Shared manager used by the API server and session loads
+disk_cache = DiskCache()
+
+if __name__ == '__main__':
+    sys.exit(main())
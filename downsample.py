@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Shape-preserving decimation of telemetry channels
+Both methods are vectorized over whole arrays (no per-sample Python loops)
+"""
+
+import numpy as np
+
+# Upper bounds so a single request cannot ask for unbounded work
+MAX_POINTS = 5000
+MIN_RESOLUTION = 0.5  # metres
+
+
+def _segment_ids(starts, length):
+    """Segment number of every element, for segments beginning at ``starts``"""
+    counts = np.diff(np.append(starts, length))
+    return np.repeat(np.arange(len(starts)), counts), counts
+
+
+def _segment_argmax(values, starts):
+    """Index of the (first) maximum of each contiguous segment"""
+    values = np.where(np.isnan(values), -np.inf, values)
+    segments, _ = _segment_ids(starts, len(values))
+    seg_max = np.maximum.reduceat(values, starts)
+    hits = np.flatnonzero(values == seg_max[segments])
+    _, first = np.unique(segments[hits], return_index=True)
+    return hits[first]
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets selection of ``n_out`` sample indices
+
+    Uses the average of the previous bucket as the left triangle vertex
+    instead of the previously selected point, which lets every bucket be
+    evaluated at once with the same visual result for dense telemetry.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+
+    # Interior points 1..n-2 are split into n_out-2 buckets
+    starts = np.linspace(0, n - 2, n_out - 1).astype(int)[:-1]
+    segments, counts = _segment_ids(starts, n - 2)
+
+    interior_x = x[1:n - 1]
+    interior_y = y[1:n - 1]
+    mean_x = np.add.reduceat(interior_x, starts) / counts
+    mean_y = np.add.reduceat(interior_y, starts) / counts
+
+    # Left vertex: previous bucket average (first point for bucket 0)
+    # Right vertex: next bucket average (last point for the final bucket)
+    ax = np.concatenate(([x[0]], mean_x[:-1]))
+    ay = np.concatenate(([y[0]], mean_y[:-1]))
+    cx = np.concatenate((mean_x[1:], [x[-1]]))
+    cy = np.concatenate((mean_y[1:], [y[-1]]))
+
+    area = np.abs(
+        (ax[segments] - cx[segments]) * (interior_y - ay[segments])
+        - (ax[segments] - interior_x) * (cy[segments] - ay[segments])
+    )
+    chosen = _segment_argmax(area, starts) + 1
+    return np.concatenate(([0], chosen, [n - 1]))
+
+
+def minmax_indices(distance, y, resolution):
+    """Keep the min and max sample of ``y`` in every distance bucket"""
+    n = len(distance)
+    if n < 3:
+        return np.arange(n)
+
+    distance = np.asarray(distance, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    buckets = np.floor((distance - np.nanmin(distance)) / resolution)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    if len(starts) * 2 >= n:
+        return np.arange(n)
+
+    highs = _segment_argmax(y, starts)
+    lows = _segment_argmax(-y, starts)
+    return np.unique(np.concatenate(([0], lows, highs, [n - 1])))
+
+
+def downsample_columns(columns, points=None, resolution=None, x='distance', y='speed'):
+    """Apply one index selection to every channel of a columns dict
+
+    ``points`` selects a target sample count (LTTB), ``resolution`` a
+    distance bucket size in metres (min/max per bucket). Without either the
+    columns are returned unchanged.
+    """
+    if resolution:
+        resolution = max(float(resolution), MIN_RESOLUTION)
+        keep = minmax_indices(columns[x], columns[y], resolution)
+    elif points:
+        keep = lttb_indices(columns[x], columns[y], min(int(points), MAX_POINTS))
+    else:
+        return columns
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def resample_distance(columns, step, x='distance'):
+    """Resample every channel onto a uniform distance grid of ``step`` metres
+
+    Laps resampled with the same step line up sample for sample, so they can
+    be compared or overlaid without further alignment. Numeric channels are
+    interpolated; boolean channels take the last sample at or before each
+    grid point.
+    """
+    distance = np.asarray(columns[x], dtype=float)
+    if len(distance) < 2:
+        return columns
+    # Distance is non-decreasing, but guard against sensor jitter
+    distance = np.maximum.accumulate(distance)
+    step = max(float(step), MIN_RESOLUTION)
+    # Grid points are multiples of the step, so every lap shares them
+    grid = np.arange(np.ceil(distance[0] / step) * step, distance[-1], step)
+    previous = np.maximum(np.searchsorted(distance, grid, side='right') - 1, 0)
+
+    resampled = {x: grid}
+    for name, values in columns.items():
+        if name == x:
+            continue
+        values = np.asarray(values)
+        if values.dtype == bool:
+            resampled[name] = values[previous]
+        else:
+            resampled[name] = np.interp(grid, distance, values.astype(float))
+    return resampled
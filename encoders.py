@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Response encoders for columnar lap and telemetry data
+Row JSON (default), columnar JSON, packed float32 binary and Arrow IPC
+"""
+
+import json
+import struct
+import numpy as np
+
+from serializers import nullable
+
+# Supported response formats and their media types
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.f1.columnar+json',
+    'binary': 'application/vnd.f1.columnar',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Packed binary layout:
+#   4s  magic  b'F1CB'
+#   H   format version
+#   H   reserved (0)
+#   I   length of the UTF-8 JSON header that follows
+#   header: {"rows": n, "columns": [names...], "meta": {...}}, space-padded
+#   to a multiple of 4 bytes, then one little-endian float32 array of
+#   ``rows`` values per column, in header order. Missing values are NaN.
+BINARY_MAGIC = b'F1CB'
+BINARY_VERSION = 1
+_BINARY_PREAMBLE = struct.Struct('<4sHHI')
+
+
+class UnsupportedFormat(ValueError):
+    """Requested format cannot be produced by this server"""
+
+
+def _pyarrow():
+    """pyarrow, imported on the first Arrow request; None if not installed"""
+    try:
+        import pyarrow
+    except ImportError:  # Arrow output is optional
+        return None
+    return pyarrow
+
+
+def negotiate_format(args, accept_header):
+    """Pick a response format from ``?format=`` or the Accept header"""
+    requested = (args.get('format') or '').strip().lower()
+    if requested:
+        if requested not in MEDIA_TYPES:
+            raise UnsupportedFormat(f"Unknown format: {requested}")
+    else:
+        requested = 'json'
+        accept = accept_header or ''
+        for name, media_type in MEDIA_TYPES.items():
+            if media_type in accept and name != 'json':
+                requested = name
+                break
+
+    if requested == 'arrow' and _pyarrow() is None:
+        raise UnsupportedFormat("Arrow output requires pyarrow")
+    return requested
+
+
+def encode_columnar_json(columns, meta):
+    """One JSON array per column plus metadata"""
+    body = dict(meta)
+    body['columns'] = {
+        name: nullable(values) if values.dtype.kind == 'f' else values.tolist()
+        for name, values in columns.items()
+    }
+    return json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+
+def encode_binary(columns, meta):
+    """Packed little-endian float32 columns behind a small JSON header"""
+    names = list(columns)
+    rows = len(columns[names[0]]) if names else 0
+    header = json.dumps({"rows": rows, "columns": names, "meta": meta},
+                        separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-len(header) % 4)
+
+    parts = [_BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(header)), header]
+    for name in names:
+        parts.append(np.ascontiguousarray(columns[name], dtype='<f4').tobytes())
+    return b''.join(parts)
+
+
+def decode_binary(data):
+    """Inverse of encode_binary, returns (columns, meta)"""
+    magic, version, _, header_len = _BINARY_PREAMBLE.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Not an F1 columnar payload")
+    offset = _BINARY_PREAMBLE.size
+    header = json.loads(data[offset:offset + header_len])
+    offset += header_len
+
+    rows = header['rows']
+    columns = {}
+    for name in header['columns']:
+        columns[name] = np.frombuffer(data, dtype='<f4', count=rows, offset=offset)
+        offset += rows * 4
+    return columns, header['meta']
+
+
+def encode_arrow(columns, meta):
+    """Arrow IPC stream with the metadata stored on the schema"""
+    pa = _pyarrow()
+    table = pa.table({name: np.asarray(values) for name, values in columns.items()})
+    table = table.replace_schema_metadata({'meta': json.dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_columns(columns, meta, fmt):
+    """Encode a columns dict in one of the non-row formats"""
+    if fmt == 'columnar':
+        return encode_columnar_json(columns, meta)
+    if fmt == 'binary':
+        return encode_binary(columns, meta)
+    if fmt == 'arrow':
+        return encode_arrow(columns, meta)
+    raise UnsupportedFormat(f"Format {fmt} is not columnar")
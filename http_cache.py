@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+HTTP validators for API responses
+Deterministic ETags, Cache-Control and 304 answers before any session is loaded
+"""
+
+import hashlib
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from schedule import is_session_final
+from session_cache import FASTF1_VERSION
+
+# Bump whenever the content of an API response changes for the same request
+DATA_VERSION = '1'
+
+FINAL_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+LIVE_CACHE_CONTROL = 'public, max-age=300'
+
+
+def request_etag():
+    """ETag from the data version, path, query parameters and Accept header"""
+    parts = [
+        DATA_VERSION,
+        FASTF1_VERSION,
+        request.path,
+        '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True))),
+        request.headers.get('Accept', '')
+    ]
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _requested_session():
+    """(year, race) addressed by the current request, race may be None"""
+    view_args = request.view_args or {}
+    year = view_args.get('year', request.args.get('year'))
+    race_name = view_args.get('race_name', request.args.get('race'))
+    return year, race_name
+
+
+def _requested_session_final():
+    """True if the current request addresses a session that can no longer change"""
+    try:
+        year, race_name = _requested_session()
+        return year is not None and is_session_final(year, race_name)
+    except (TypeError, ValueError):
+        return False
+
+
+def http_cached(view):
+    """Add ETag/Cache-Control to GET responses and answer If-None-Match with 304
+
+    For completed sessions the validator is computed from the request alone,
+    so a matching If-None-Match is answered before the view loads any
+    session, and the response gets a long-lived immutable Cache-Control.
+    Data that can still change is validated by a hash of the response body
+    instead, so a client is never told 304 for an answer that has since
+    changed. A view that sets its own Cache-Control (e.g. for an incomplete
+    answer) is left untouched.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        etag = request_etag()
+        # Finality may need the event schedule: only worked out for a
+        # revalidation or once the view has answered
+        revalidating = request.if_none_match.contains(etag)
+        final = revalidating and _requested_session_final()
+
+        if final:
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or 'Cache-Control' in response.headers:
+                return response
+            if not revalidating:
+                final = _requested_session_final()
+            if not final:
+                # Streamed bodies cannot be hashed up front: no validator at all
+                etag = None if response.is_streamed else hashlib.sha1(response.get_data()).hexdigest()
+                if etag is not None and request.if_none_match.contains(etag):
+                    response = Response(status=304)
+
+        if etag is not None:
+            response.set_etag(etag)
+        response.headers['Cache-Control'] = FINAL_CACHE_CONTROL if final else LIVE_CACHE_CONTROL
+        response.vary.add('Accept')
+        return response
+    return wrapper
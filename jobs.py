@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Background session-load jobs
+A fixed-size worker pool runs cold FastF1 loads so request threads never block
+"""
+
+import os
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from session_cache import session_cache, make_session_key, tier_rank
+from session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+LOAD_WORKERS = int(os.environ.get('LOAD_WORKERS', 2))
+MAX_QUEUED_LOADS = int(os.environ.get('MAX_QUEUED_LOADS', 8))
+# Background loads wait this long for memory before failing (see SessionCache)
+LOAD_ADMISSION_TIMEOUT = float(os.environ.get('LOAD_ADMISSION_TIMEOUT', 5 * 60))
+# Finished jobs are kept this long so clients can still poll their result
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 15 * 60))
+# Events kept per job for late Server-Sent Events subscribers
+MAX_JOB_EVENTS = 200
+
+
+class QueueFull(Exception):
+    """Too many loads are queued already"""
+
+
+class Job:
+    """One session load and its progress"""
+
+    def __init__(self, year, race_name, session_type, tier):
+        self.id = uuid.uuid4().hex[:16]
+        self.year = int(year)
+        self.race_name = race_name
+        self.session_type = session_type
+        self.tier = tier
+        self.state = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.last_seq = 0
+
+    @property
+    def done(self):
+        return self.state in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "year": self.year,
+            "race": self.race_name,
+            "session": self.session_type,
+            "tier": self.tier,
+            "state": self.state,
+            "error": self.error,
+            "progress": self.events[-1]['message'] if self.events else None,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished
+        }
+
+
+class _JobLogHandler(logging.Handler):
+    """Turns FastF1 log lines emitted on a job's thread into progress events"""
+
+    def __init__(self, manager):
+        super().__init__(level=logging.INFO)
+        self.manager = manager
+
+    def emit(self, record):
+        job = self.manager._running.get(threading.get_ident())
+        if job is not None:
+            self.manager._event(job, record.getMessage())
+
+
+class JobManager:
+    """Queue of session loads served by a bounded thread pool"""
+
+    def __init__(self, workers=LOAD_WORKERS, max_queued=MAX_QUEUED_LOADS):
+        self.max_queued = max_queued
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='session-load')
+        self._jobs = OrderedDict()
+        self._active = {}   # (session key, tier) -> job
+        self._running = {}  # thread ident -> job
+        self._changed = threading.Condition()
+        logging.getLogger('fastf1').addHandler(_JobLogHandler(self))
+
+    def submit(self, year, race_name, session_type='R', tier='telemetry'):
+        """Queue a load, or return the active job for the same session and tier"""
+        tier_rank(tier)
+        key = (make_session_key(year, race_name, session_type), tier)
+        with self._changed:
+            self._expire()
+            job = self._active.get(key)
+            if job is not None:
+                return job
+            queued = sum(1 for j in self._active.values() if j.state == 'queued')
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} session loads already queued")
+
+            job = Job(year, race_name, session_type, tier)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._event(job, 'queued')
+        self._pool.submit(self._run, job, key)
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def events(self, job, since=0, timeout=15):
+        """Block until the job has events newer than ``since`` (or timeout)"""
+        with self._changed:
+            self._changed.wait_for(lambda: job.last_seq > since or job.done, timeout=timeout)
+            return [event for event in job.events if event['seq'] > since]
+
+    def stats(self):
+        with self._changed:
+            states = [job.state for job in self._jobs.values()]
+            return {state: states.count(state) for state in ('queued', 'running', 'done', 'failed')}
+
+    def _run(self, job, key):
+        ident = threading.get_ident()
+        with self._changed:
+            job.state = 'running'
+            job.started = time.time()
+            self._running[ident] = job
+            self._event(job, 'loading')
+        try:
+            session = session_cache.get(job.year, job.race_name, job.session_type, tier=job.tier,
+                                        timeout=LOAD_ADMISSION_TIMEOUT)
+            self._event(job, 'writing session store')
+            session_store.write(key[0], session, tier=job.tier)
+            state, error = 'done', None
+        except Exception as e:
+            logger.error(f"Load job {job.id} failed: {str(e)}")
+            state, error = 'failed', str(e)
+        with self._changed:
+            self._running.pop(ident, None)
+            self._active.pop(key, None)
+            job.state = state
+            job.error = error
+            job.finished = time.time()
+            self._event(job, state if error is None else f"failed: {error}")
+
+    def _event(self, job, message):
+        with self._changed:
+            job.last_seq += 1
+            job.events.append({"seq": job.last_seq, "state": job.state,
+                               "message": message, "time": time.time()})
+            del job.events[:-MAX_JOB_EVENTS]
+            self._changed.notify_all()
+
+    def _expire(self):
+        """Forget finished jobs older than JOB_RETENTION (lock held)"""
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+# Shared job manager used by the API server
+job_manager = JobManager()
@@ -6,6 +6,7 @@ class F1App {
         this.f1Calendar = {};
         this.lapChart = null;
         this.telemetryChart = null;
+        this.comparisonChart = null;
         
         // Smart API detection
         this.apiBaseUrl = this.detectApiUrl();
@@ -13,6 +14,10 @@ class F1App {
         this.useRealData = false;
         this.isComparing = false; // Prevent multiple simultaneous comparisons
         this.isLoadingTelemetry = false; // Prevent multiple telemetry loads
+        this.telemetryPoints = 600; // Samples requested per telemetry trace
+        this.snapshot = null; // Static export manifest, used when the API is down
+        this.snapshotBaseUrl = 'data/snapshot/';
+        this.snapshotFiles = new Map(); // Parsed snapshot files by URL
         
         this.init();
     }
@@ -66,7 +71,43 @@ class F1App {
             }
         } catch (error) {
             this.useRealData = false;
-            console.log('📊 Using sample data (API not available)');
+        }
+        
+        if (!this.useRealData) {
+            await this.loadSnapshotManifest();
+        }
+    }
+    
+    async loadSnapshotManifest() {
+        // Pre-built static export (snapshot.py): real races without the Python API
+        try {
+            const response = await fetch(`${this.snapshotBaseUrl}manifest.json`, { cache: 'no-cache' });
+            if (response.ok) {
+                this.snapshot = await response.json();
+                this.useRealData = true;
+                console.log('🗂️ Using static F1 data snapshot (API not available)');
+                return;
+            }
+        } catch (error) {
+            console.error('Failed to load data snapshot:', error);
+        }
+        console.log('📊 Using sample data (API not available)');
+    }
+    
+    async fetchSnapshotFile(path) {
+        // Snapshot files are content-hashed, so a parsed copy never goes stale
+        const url = this.snapshotBaseUrl + path;
+        if (!this.snapshotFiles.has(url)) {
+            this.snapshotFiles.set(url, fetch(url).then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}: ${url}`);
+                return response.json();
+            }));
+        }
+        try {
+            return await this.snapshotFiles.get(url);
+        } catch (error) {
+            this.snapshotFiles.delete(url);
+            throw error;
         }
     }
     
@@ -86,7 +127,7 @@ class F1App {
             z-index: 1000;
             box-shadow: 0 2px 10px rgba(0,0,0,0.3);
         `;
-        indicator.textContent = this.useRealData ? '🏎️ REAL F1 DATA' : '📊 SAMPLE DATA';
+        indicator.textContent = this.snapshot ? '🗂️ F1 DATA SNAPSHOT' : (this.useRealData ? '🏎️ REAL F1 DATA' : '📊 SAMPLE DATA');
         document.body.appendChild(indicator);
         
         // Update page title
@@ -97,6 +138,14 @@ class F1App {
     }
     
     async loadAvailableYears() {
+        if (this.snapshot) {
+            this.f1Calendar = {};
+            for (const [year, season] of Object.entries(this.snapshot.years)) {
+                this.f1Calendar[year] = season.races;
+            }
+            return;
+        }
+        
         if (this.useRealData) {
             try {
                 const response = await fetch(`${this.apiBaseUrl}/years`);
@@ -248,6 +297,8 @@ class F1App {
     }
     
     async loadRaceSchedule(year) {
+        if (this.snapshot) return; // Races come with the snapshot manifest
+        
         try {
             const response = await fetch(`${this.apiBaseUrl}/races/${year}`);
             if (response.ok) {
@@ -316,11 +367,41 @@ class F1App {
         }
     }
     
+    async fetchApi(url) {
+        // Cold sessions load in a background job (HTTP 202): wait for it, then retry
+        let response = await fetch(url);
+        while (response.status === 202) {
+            const { job } = await response.json();
+            await this.waitForJob(job.id);
+            response = await fetch(url);
+        }
+        return response;
+    }
+    
+    async waitForJob(jobId) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const response = await fetch(`${this.apiBaseUrl}/jobs/${jobId}`);
+            if (!response.ok) return;
+            
+            const job = await response.json();
+            if (job.state === 'done') return;
+            if (job.state === 'failed') {
+                throw new Error(`Loading race data failed: ${job.error}`);
+            }
+        }
+    }
+    
     async loadAvailableDrivers() {
         if (!this.selectedYear || !this.selectedRace || !this.useRealData) return;
         
         try {
-            const response = await fetch(`${this.apiBaseUrl}/drivers/${this.selectedYear}/${encodeURIComponent(this.selectedRace.name)}`);
+            if (this.snapshot) {
+                this.availableDrivers = await this.fetchSnapshotFile(this.selectedRace.files.drivers);
+                return;
+            }
+            
+            const response = await this.fetchApi(`${this.apiBaseUrl}/drivers/${this.selectedYear}/${encodeURIComponent(this.selectedRace.name)}`);
             if (response.ok) {
                 this.availableDrivers = await response.json();
             } else {
@@ -599,15 +680,24 @@ class F1App {
         }
         
         try {
-            const response = await fetch(`${this.apiBaseUrl}/lap-times?year=${this.selectedYear}&race=${encodeURIComponent(this.selectedRace.name)}&drivers=${driver1},${driver2}`);
-            
-            if (!response.ok) {
-                const errorText = await response.text();
-                throw new Error(`HTTP ${response.status}: ${errorText}`);
+            let lapData;
+            if (this.snapshot) {
+                // The snapshot holds every driver's laps: keep the two compared
+                const allLapData = await this.fetchSnapshotFile(this.selectedRace.files.lap_times);
+                lapData = {};
+                if (allLapData[driver1]) lapData[driver1] = allLapData[driver1];
+                if (allLapData[driver2]) lapData[driver2] = allLapData[driver2];
+            } else {
+                const response = await this.fetchApi(`${this.apiBaseUrl}/lap-times?year=${this.selectedYear}&race=${encodeURIComponent(this.selectedRace.name)}&drivers=${driver1},${driver2}`);
+                
+                if (!response.ok) {
+                    const errorText = await response.text();
+                    throw new Error(`HTTP ${response.status}: ${errorText}`);
+                }
+                
+                lapData = await response.json();
             }
             
-            const lapData = await response.json();
-            
             // Clear the loading and create the chart
             this.createLapTimeChart(lapData, driver1, driver2, true);
             
@@ -690,7 +780,7 @@ class F1App {
                 <div style="position: relative; height: 600px; width: 100%;">
                     <canvas id="lapChart"></canvas>
                 </div>
-                ${this.useRealData ? '<p class="chart-hint">Click on any lap point to view detailed telemetry data</p>' : ''}
+                ${this.useRealData ? '<p class="chart-hint">Click on any lap point to view detailed telemetry and the lap delta</p>' : ''}
             `;
         }
         
@@ -822,6 +912,7 @@ class F1App {
                         const driverCode = dataset.label.match(/\(([^)]+)\)/)[1];
                         
                         this.loadTelemetry(driverCode, lapNumber);
+                        this.loadLapComparison(driver1, driver2, lapNumber);
                     }
                 } : undefined
             }
@@ -844,7 +935,7 @@ class F1App {
             <div style="position: relative; height: 600px; width: 100%;">
                 <canvas id="lapChart"></canvas>
             </div>
-            ${this.useRealData ? '<p class="chart-hint">Click on any lap point to view detailed telemetry data</p>' : ''}
+            ${this.useRealData ? '<p class="chart-hint">Click on any lap point to view detailed telemetry and the lap delta</p>' : ''}
         `;
         
         chartContainer.appendChild(chartSection);
@@ -876,7 +967,13 @@ class F1App {
         }
         
         try {
-            const response = await fetch(`${this.apiBaseUrl}/telemetry?year=${this.selectedYear}&race=${encodeURIComponent(this.selectedRace.name)}&driver=${driverCode}&lap=${lapNumber}`);
+            if (this.snapshot) {
+                this.createTelemetryChart(await this.loadSnapshotTelemetry(driverCode, lapNumber));
+                return;
+            }
+            
+            // Server-side decimation: the chart cannot show more points than this anyway
+            const response = await this.fetchApi(`${this.apiBaseUrl}/telemetry?year=${this.selectedYear}&race=${encodeURIComponent(this.selectedRace.name)}&driver=${driverCode}&lap=${lapNumber}&points=${this.telemetryPoints}`);
             
             if (!response.ok) {
                 throw new Error(`HTTP ${response.status}: ${await response.text()}`);
@@ -903,6 +1000,127 @@ class F1App {
         }
     }
     
+    async loadSnapshotTelemetry(driverCode, lapNumber) {
+        // Per-driver file with every lap, one array per channel
+        const path = this.selectedRace.files.telemetry[driverCode];
+        if (!path) throw new Error(`No telemetry in the snapshot for ${driverCode}`);
+        
+        const laps = await this.fetchSnapshotFile(path);
+        const lap = laps[String(lapNumber)];
+        if (!lap) throw new Error(`No telemetry in the snapshot for ${driverCode} lap ${lapNumber}`);
+        
+        return {
+            driver: driverCode,
+            lap: lapNumber,
+            telemetry: lap.distance.map((distance, i) => ({
+                distance: distance,
+                speed: lap.speed[i],
+                throttle: lap.throttle[i],
+                brake: lap.brake[i] === 1
+            }))
+        };
+    }
+    
+    async loadLapComparison(driver1, driver2, lapNumber) {
+        // Lap deltas are computed by the API only
+        if (!this.useRealData || this.snapshot) return;
+        
+        try {
+            // Both laps are aligned and compared server-side: one compact delta trace
+            const response = await this.fetchApi(`${this.apiBaseUrl}/lap-comparison?year=${this.selectedYear}&race=${encodeURIComponent(this.selectedRace.name)}&driver1=${driver1}&lap1=${lapNumber}&driver2=${driver2}&lap2=${lapNumber}`);
+            
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${await response.text()}`);
+            }
+            
+            this.createComparisonChart(await response.json());
+        } catch (error) {
+            console.error('Error loading lap comparison:', error);
+        }
+    }
+    
+    createComparisonChart(comparison) {
+        if (this.comparisonChart) {
+            this.comparisonChart.destroy();
+            this.comparisonChart = null;
+        }
+        
+        const chartContainer = this.getOrCreateChartContainer();
+        const existing = chartContainer.querySelector('.comparison-section');
+        if (existing) existing.remove();
+        
+        const { reference, comparison: other } = comparison;
+        const section = document.createElement('div');
+        section.className = 'comparison-section';
+        section.innerHTML = `
+            <h3>⏱️ Delta - ${other.driver} vs ${reference.driver} Lap ${reference.lap}</h3>
+            <div style="position: relative; height: 450px; width: 100%;">
+                <canvas id="comparisonChart"></canvas>
+            </div>
+        `;
+        chartContainer.appendChild(section);
+        
+        const points = (values) => comparison.distance.map((distance, i) => ({ x: distance, y: values[i] }));
+        this.comparisonChart = new Chart(document.getElementById('comparisonChart').getContext('2d'), {
+            type: 'line',
+            data: {
+                datasets: [
+                    {
+                        label: `Delta to ${reference.driver} (s)`,
+                        data: points(comparison.delta),
+                        borderColor: '#FFD700',
+                        yAxisID: 'y',
+                        borderWidth: 2,
+                        pointRadius: 0
+                    },
+                    {
+                        label: 'Speed difference (km/h)',
+                        data: points(comparison.speed_diff),
+                        borderColor: '#00C896',
+                        yAxisID: 'y1',
+                        borderWidth: 1,
+                        pointRadius: 0
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    title: {
+                        display: true,
+                        text: `${other.driver} ${other.time.toFixed(3)}s vs ${reference.driver} ${reference.time.toFixed(3)}s`,
+                        color: '#ffffff',
+                        font: { size: 16, family: 'Orbitron' }
+                    },
+                    legend: {
+                        labels: { color: '#ffffff', font: { family: 'Rajdhani' } }
+                    }
+                },
+                scales: {
+                    x: {
+                        type: 'linear',
+                        title: { display: true, text: 'Distance (m)', color: '#ffffff' },
+                        ticks: { color: '#ffffff' },
+                        grid: { color: 'rgba(255, 255, 255, 0.1)' }
+                    },
+                    y: {
+                        position: 'left',
+                        title: { display: true, text: 'Delta (s)', color: '#ffffff' },
+                        ticks: { color: '#ffffff' },
+                        grid: { color: 'rgba(255, 255, 255, 0.1)' }
+                    },
+                    y1: {
+                        position: 'right',
+                        title: { display: true, text: 'Speed difference (km/h)', color: '#ffffff' },
+                        ticks: { color: '#ffffff' },
+                        grid: { drawOnChartArea: false }
+                    }
+                }
+            }
+        });
+    }
+    
     createTelemetryChart(telemetryData) {
         console.log('Creating telemetry chart for:', telemetryData.driver, 'lap', telemetryData.lap);
         
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Per-session lap index
+Maps (driver, lap) to the lap's row in the lap table and to its sample range
+in the driver's car data, both as dense integer arrays, so finding a lap or
+slicing its telemetry needs no DataFrame filtering or FastF1 merge
+"""
+
+import copy
+
+import numpy as np
+
+from serializers import lap_columns, timedelta_seconds
+
+# Attribute holding the index on a loaded session
+INDEX_ATTR = '_lap_index'
+
+
+def driver_telemetry_arrays(car_data, driver_laps):
+    """Car channels of one driver plus per-lap sample offsets
+
+    Reproduces ``lap.get_car_data().add_distance()`` for every lap at once:
+    distance is integrated once over the whole session (``cumdist``) and a
+    lap's distance is ``cumdist[lo:hi] - cumdist[lo] + first_ds``, where
+    ``offsets`` rows are ``(lap number, lo, hi, first_ds)``.
+    """
+    session_time = timedelta_seconds(car_data['SessionTime'])
+    speed = np.nan_to_num(car_data['Speed'].to_numpy(dtype=float))
+    throttle = np.nan_to_num(car_data['Throttle'].to_numpy(dtype=float))
+    brake = car_data['Brake'].fillna(False).to_numpy(dtype=bool)
+
+    ds = speed / 3.6 * np.diff(session_time, prepend=session_time[:1])
+    cumdist = np.cumsum(ds)
+
+    start = timedelta_seconds(driver_laps['LapStartTime'])
+    end = timedelta_seconds(driver_laps['Time'])
+    lap_number = driver_laps['LapNumber'].to_numpy(dtype=float)
+    known = ~(np.isnan(start) | np.isnan(end) | np.isnan(lap_number))
+    start, end, lap_number = start[known], end[known], lap_number[known]
+
+    lo = np.searchsorted(session_time, start, side='left')
+    hi = np.searchsorted(session_time, end, side='right')
+    if len(session_time):
+        # Distance covered between the lap start and its first sample
+        first = np.minimum(lo, len(session_time) - 1)
+        first_ds = np.where(lo < hi, speed[first] / 3.6 * (session_time[first] - start), 0.0)
+    else:
+        first_ds = np.zeros(len(lo))
+
+    return {
+        "session_time": session_time,
+        "speed": speed,
+        "throttle": throttle,
+        "brake": brake,
+        "cumdist": cumdist,
+        "offsets": np.column_stack([lap_number, lo, hi, first_ds])
+    }
+
+
+def slice_lap(arrays, lo, hi, first_ds):
+    """Telemetry columns of one lap from driver_telemetry_arrays() output"""
+    lo, hi = int(lo), int(hi)
+    cumdist = arrays['cumdist'][lo:hi]
+    return {
+        "distance": cumdist - cumdist[0] + first_ds if hi > lo else np.zeros(0),
+        "speed": np.array(arrays['speed'][lo:hi]),
+        "throttle": np.array(arrays['throttle'][lo:hi]),
+        "brake": np.array(arrays['brake'][lo:hi])
+    }
+
+
+def lap_slots(lap_numbers):
+    """Array mapping a lap number to its position in ``lap_numbers`` (-1 if absent)"""
+    lap_numbers = np.asarray(lap_numbers, dtype=float)
+    known = np.flatnonzero(~np.isnan(lap_numbers) & (lap_numbers >= 0))
+    laps = lap_numbers[known].astype(int)
+    slots = np.full(int(laps.max()) + 1 if len(laps) else 0, -1, dtype=np.int32)
+    slots[laps] = known
+    return slots
+
+
+def _slot(slots, lap_number):
+    lap_number = int(lap_number)
+    return int(slots[lap_number]) if 0 <= lap_number < len(slots) else -1
+
+
+class LapRows:
+    """(driver, lap) -> row of a lap table
+
+    Built from the table's car number, abbreviation and lap number columns.
+    ``numbers[i]`` is driver ``i`` and ``rows[i, lap]`` the row of that lap
+    (-1 when missing); drivers are addressed by abbreviation or car number.
+    """
+
+    def __init__(self, numbers, abbreviations, lap_numbers):
+        numbers = np.asarray(numbers).astype(str)
+        abbreviations = np.asarray(abbreviations).astype(str)
+        lap_numbers = np.asarray(lap_numbers, dtype=float)
+
+        self.numbers, self.driver_of_row = np.unique(numbers, return_inverse=True)
+        self.abbreviations = np.empty(len(self.numbers), dtype=object)
+        self.abbreviations[self.driver_of_row] = abbreviations
+        self._codes = {}
+        for i, (number, abbreviation) in enumerate(zip(numbers, abbreviations)):
+            self._codes.setdefault(number, self.driver_of_row[i])
+            self._codes.setdefault(abbreviation, self.driver_of_row[i])
+
+        known = ~np.isnan(lap_numbers) & (lap_numbers >= 0)
+        self.width = int(lap_numbers[known].max()) + 1 if known.any() else 0
+        self.rows = np.full((len(self.numbers), self.width), -1, dtype=np.int32)
+        self.rows[self.driver_of_row[known], lap_numbers[known].astype(int)] = np.flatnonzero(known)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.driver_of_row.nbytes
+
+    def driver(self, driver_code):
+        """Position of a driver in ``numbers``, None if unknown"""
+        return self._codes.get(str(driver_code))
+
+    def row(self, driver_code, lap_number):
+        """Row of one lap, None if the driver has no such lap"""
+        i = self.driver(driver_code)
+        row = _slot(self.rows[i], lap_number) if i is not None else -1
+        return row if row >= 0 else None
+
+    def driver_rows(self, driver_code):
+        """Rows of a driver's laps in lap order (empty if unknown)"""
+        i = self.driver(driver_code)
+        if i is None:
+            return np.zeros(0, dtype=np.int32)
+        rows = self.rows[i]
+        return rows[rows >= 0]
+
+
+def lap_rows(columns):
+    """LapRows over a lap table from serializers.lap_columns()"""
+    return LapRows(columns['number'], columns['driver'], columns['lap'])
+
+
+class LapIndex:
+    """(driver, lap) lookups over one session's laps and car data
+
+    ``columns`` is the session's lap table (serializers.lap_columns(), the
+    rows /api/lap-times serves) and ``laps`` its LapRows. ``slots[driver,
+    lap]`` is a lap's row in that driver's telemetry offsets (-1 when
+    missing); telemetry covers every lap, valid or not.
+    """
+
+    def __init__(self, laps, car_data=None):
+        self.columns = lap_columns(laps)
+        self.laps = lap_rows(self.columns)
+
+        # Telemetry is indexed over all laps (out and in laps included)
+        drivers = LapRows(laps['DriverNumber'], laps['Driver'], laps['LapNumber'].to_numpy(dtype=float))
+        self.numbers, self.abbreviations = drivers.numbers, drivers.abbreviations
+        self._drivers = drivers
+        self.slots = np.full((len(self.numbers), drivers.width), -1, dtype=np.int32)
+        self.telemetry = {}
+        if car_data is not None:
+            for i, number in enumerate(self.numbers):
+                if number not in car_data:
+                    continue
+                driver_laps = laps.iloc[np.flatnonzero(drivers.driver_of_row == i)]
+                arrays = driver_telemetry_arrays(car_data[number], driver_laps)
+                slots = lap_slots(arrays['offsets'][:, 0])
+                self.slots[i, :len(slots)] = slots[:drivers.width]
+                self.telemetry[number] = arrays
+
+    @property
+    def has_telemetry(self):
+        return bool(self.telemetry)
+
+    @property
+    def nbytes(self):
+        """Memory held by the index arrays"""
+        return self.laps.nbytes + self._drivers.nbytes + self.slots.nbytes + sum(
+            values.nbytes for values in self.columns.values()) + sum(
+            values.nbytes for arrays in self.telemetry.values() for values in arrays.values())
+
+    def driver(self, driver_code):
+        """Position of a driver in ``numbers``, None if unknown"""
+        return self._drivers.driver(driver_code)
+
+    def driver_arrays(self, driver_code):
+        """driver_telemetry_arrays() of a driver, None without telemetry"""
+        i = self.driver(driver_code)
+        return self.telemetry.get(self.numbers[i]) if i is not None else None
+
+    def lap_telemetry(self, driver_code, lap_number):
+        """Telemetry columns of one lap (distance, speed, throttle and brake)"""
+        arrays = self.driver_arrays(driver_code)
+        if arrays is None:
+            raise KeyError(f"No telemetry indexed for driver {driver_code}")
+        slot = _slot(self.slots[self.driver(driver_code)], lap_number)
+        if slot < 0:
+            raise KeyError(f"No lap {lap_number} indexed for driver {driver_code}")
+        _, lo, hi, first_ds = arrays['offsets'][slot]
+        return slice_lap(arrays, lo, hi, first_ds)
+
+    def without_telemetry(self):
+        """Copy of the index without car data arrays, sharing the lap table and lookups"""
+        index = copy.copy(self)
+        index.telemetry = {}
+        index.slots = np.full_like(self.slots, -1)
+        return index
+
+
+def build_lap_index(session, telemetry=False):
+    """Index a loaded session's laps (and car data) and attach it to the session"""
+    index = LapIndex(session.laps, session.car_data if telemetry else None)
+    setattr(session, INDEX_ATTR, index)
+    return index
+
+
+def session_lap_index(session, telemetry=False):
+    """The session's LapIndex, built on first use
+
+    Rebuilt when ``telemetry`` is asked for and the attached index was made
+    without car data (e.g. before the session was upgraded).
+    """
+    index = getattr(session, INDEX_ATTR, None)
+    if index is None or (telemetry and not index.has_telemetry):
+        index = build_lap_index(session, telemetry)
+    return index
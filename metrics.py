@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Request instrumentation and Prometheus text exposition
+Per-endpoint latency, per-phase timings (load/extract/serialize), payload sizes
+and startup timings (time to first byte after a boot or wake-up)
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Latency buckets in seconds: cached answers are sub-millisecond, cold loads minutes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Always send Server-Timing headers (otherwise only on ?timing=1)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels + ('le',), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labels + ('le',), label_values + ('+Inf',))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_gauge(name, documentation, samples, kind='gauge'):
+    """Exposition lines for a gauge/counter from (labels dict, value) samples"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return lines
+
+
+REQUEST_LATENCY = Histogram('f1_request_duration_seconds',
+                            'Request latency by endpoint', ('endpoint', 'status'))
+PHASE_LATENCY = Histogram('f1_phase_duration_seconds',
+                          'Time spent per request phase', ('endpoint', 'phase'))
+RESPONSE_SIZE = Histogram('f1_response_bytes', 'Response payload size by endpoint',
+                          ('endpoint',), buckets=SIZE_BUCKETS)
+
+
+def _process_start():
+    """Wall-clock start of this process (Linux /proc), else the import of this module"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 (starttime, clock ticks after boot); fields after the ')' start at 3
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED = _process_start()
+# Seconds after process start (or durations) of startup milestones
+_startup = {}
+
+
+def record_startup(name, seconds):
+    """Record a startup milestone once; later values for the same name are ignored"""
+    _startup.setdefault(name, round(seconds, 4))
+
+
+def startup_times():
+    return dict(_startup)
+
+
+@contextmanager
+def phase(name):
+    """Time a phase of the current request (no-op outside requests)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            phases = g.setdefault('phases', {})
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - started
+
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def start_request():
+    """before_request hook"""
+    g.request_started = time.perf_counter()
+
+
+def finish_request(response):
+    """after_request hook: record metrics and add Server-Timing if asked for"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = _endpoint()
+    phases = g.get('phases', {})
+
+    REQUEST_LATENCY.observe(elapsed, endpoint, str(response.status_code))
+    for name, seconds in phases.items():
+        PHASE_LATENCY.observe(seconds, endpoint, name)
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, endpoint)
+
+    record_startup('first_response', time.time() - PROCESS_STARTED)
+
+    if SERVER_TIMING or request.args.get('timing') == '1':
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+        entries.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(entries)
+    return response
+
+
+def cache_metric_lines(cache_stats, store_stats, job_stats, replay_stats=None):
+    """Gauges/counters from SessionCache, SessionStore, JobManager and ReplayHub stats()"""
+    derived = cache_stats['derived']
+    lines = []
+    lines += render_gauge('f1_session_cache_lookups_total', 'Session cache lookups by result',
+                          [({"result": "hit"}, cache_stats['hits']),
+                           ({"result": "miss"}, cache_stats['misses'])], kind='counter')
+    lines += render_gauge('f1_session_cache_hit_ratio', 'Session cache hit ratio',
+                          [({}, cache_stats['hit_ratio'])])
+    lines += render_gauge('f1_session_cache_evictions_total', 'Sessions evicted, expired or downgraded',
+                          [({"reason": "evicted"}, cache_stats['evictions']),
+                           ({"reason": "expired"}, cache_stats['expirations']),
+                           ({"reason": "downgraded"}, cache_stats['downgrades'])], kind='counter')
+    lines += render_gauge('f1_session_admissions_total', 'Session loads that waited for or were denied memory',
+                          [({"result": "waited"}, cache_stats['admission_waits']),
+                           ({"result": "rejected"}, cache_stats['rejections'])], kind='counter')
+    lines += render_gauge('f1_sessions_resident', 'Sessions held in memory',
+                          [({}, cache_stats['entries'])])
+    lines += render_gauge('f1_sessions_resident_bytes', 'Estimated memory of resident sessions',
+                          [({}, cache_stats['bytes'])])
+    lines += render_gauge('f1_sessions_reserved_bytes', 'Memory reserved for session loads in flight',
+                          [({}, cache_stats['reserved_bytes'])])
+    lines += render_gauge('f1_session_memory_budget_bytes', 'Session memory budget',
+                          [({}, cache_stats['max_bytes'])])
+    lines += render_gauge('f1_session_bytes', 'Estimated memory per resident session',
+                          [({"year": s['year'], "race": s['race'], "session": s['session'],
+                             "tier": s['tier']}, s['bytes'])
+                           for s in cache_stats['sessions']])
+    lines += render_gauge('f1_sessions_loading', 'Session loads in flight',
+                          [({}, cache_stats['loading'])])
+    lines += render_gauge('f1_derived_cache_lookups_total', 'Derived result cache lookups by result',
+                          [({"result": "hit"}, derived['hits']),
+                           ({"result": "miss"}, derived['misses'])], kind='counter')
+    lines += render_gauge('f1_derived_cache_entries', 'Derived results held in memory',
+                          [({}, derived['entries'])])
+    lines += render_gauge('f1_store_lookups_total', 'Session store lookups by result',
+                          [({"result": "hit"}, store_stats['hits']),
+                           ({"result": "miss"}, store_stats['misses'])], kind='counter')
+    lines += render_gauge('f1_load_jobs', 'Background load jobs by state',
+                          [({"state": state}, count) for state, count in job_stats.items()])
+    if replay_stats is not None:
+        lines += render_gauge('f1_live_replays', 'Live timing replays running',
+                              [({}, replay_stats['replays'])])
+        lines += render_gauge('f1_live_subscribers', 'Clients connected to live timing',
+                              [({}, replay_stats['subscribers'])])
+        lines += render_gauge('f1_live_rejected_total', 'Live timing clients turned away at the limit',
+                              [({}, replay_stats['rejected_subscribers'])], kind='counter')
+    return lines
+
+
+def disk_cache_metric_lines(counters, max_bytes):
+    """Gauges/counters from DiskCache.counters(); sizes are from its last scan"""
+    scan = counters['last_scan']
+    lines = []
+    lines += render_gauge('f1_disk_cache_loads_total', 'FastF1 loads by whether the session was on disk',
+                          [({"result": "hit"}, counters['hits']),
+                           ({"result": "miss"}, counters['misses'])], kind='counter')
+    lines += render_gauge('f1_disk_cache_sessions_total', 'Cached sessions evicted, compacted or restored',
+                          [({"action": "evicted"}, counters['evictions']),
+                           ({"action": "compacted"}, counters['compactions']),
+                           ({"action": "restored"}, counters['restores'])], kind='counter')
+    lines += render_gauge('f1_disk_cache_budget_bytes', 'Disk cache budget (0 = unlimited)',
+                          [({}, max_bytes)])
+    if scan:
+        lines += render_gauge('f1_disk_cache_bytes', 'Disk cache size at the last scan',
+                              [({"kind": kind}, scan[kind]) for kind in ('fastf1', 'store', 'http', 'other')])
+    return lines
+
+
+def render_metrics(extra=()):
+    """Full Prometheus text exposition; ``extra`` adds pre-rendered lines"""
+    lines = []
+    for histogram in (REQUEST_LATENCY, PHASE_LATENCY, RESPONSE_SIZE):
+        lines.extend(histogram.render())
+    lines += render_gauge('f1_startup_seconds', 'Startup milestones: app_ready and first_response '
+                          'after process start, fastf1_import duration',
+                          [({"phase": name}, seconds) for name, seconds in sorted(_startup.items())])
+    lines.extend(extra)
+    return '\n'.join(lines) + '\n'
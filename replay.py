@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Replay of a session's timing as a live feed
+A session's laps are turned once into a time-ordered list of pre-rendered
+Server-Sent Events (sector times, completed laps, position changes). One
+producer per replay plays them back at a chosen speed into a shared log that
+any number of clients read from.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+import uuid
+import logging
+
+import numpy as np
+
+from serializers import timedelta_seconds
+
+logger = logging.getLogger(__name__)
+
+REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED', 1.0))
+MAX_REPLAY_SPEED = 100.0
+# Producers running at once; each replay is shared by all of its clients
+MAX_REPLAYS = int(os.environ.get('MAX_REPLAYS', 8))
+# Connected clients per process: each holds a server thread for as long as it
+# listens, so by default half of the gunicorn threads stay free for the API
+MAX_LIVE_SUBSCRIBERS = int(os.environ.get('MAX_LIVE_SUBSCRIBERS',
+                                          int(os.environ.get('WEB_THREADS', 64)) // 2))
+# A replay without clients for this long is stopped
+REPLAY_IDLE_TIMEOUT = 30
+# Wall-clock seconds between 'clock' events
+REPLAY_TICK = 1.0
+
+# Order of simultaneous events: a lap is reported before the position it gained
+_EVENT_ORDER = {'sector': 0, 'lap': 1, 'position': 2}
+
+
+class TooManyReplays(Exception):
+    """Every replay slot is taken"""
+
+
+class TooManySubscribers(Exception):
+    """The process already streams to as many clients as it allows"""
+
+
+def _seconds(values):
+    """Rounded floats with NaN as None"""
+    rounded = np.round(values.astype(float), 3)
+    return [None if np.isnan(value) else value for value in rounded.tolist()]
+
+
+def _sector_end(laps, sector, start, durations):
+    """Session time a sector ended, from FastF1's column or the summed durations"""
+    column = f"Sector{sector}SessionTime"
+    if column in laps.columns:
+        return timedelta_seconds(laps[column])
+    return start + np.sum(durations[:sector], axis=0)
+
+
+def replay_timeline(laps):
+    """Sorted replay events of a Laps frame
+
+    Returns a dict with ``time`` (session seconds, ascending), ``events``
+    (name, payload) in the same order and the session time of the first
+    lap start of every lap number (``lap_starts``) for starting mid-race.
+    """
+    driver = laps['Driver'].astype(str).to_numpy()
+    number = laps['DriverNumber'].astype(str).to_numpy()
+    lap = laps['LapNumber'].to_numpy(dtype=float)
+    start = timedelta_seconds(laps['LapStartTime'])
+    end = timedelta_seconds(laps['Time'])
+    lap_time = timedelta_seconds(laps['LapTime'])
+    durations = np.array([timedelta_seconds(laps[f"Sector{i}Time"]) for i in (1, 2, 3)])
+    position = laps['Position'].to_numpy(dtype=float) if 'Position' in laps.columns \
+        else np.full(len(laps), np.nan)
+    compound = laps['Compound'].fillna('Unknown').astype(str).to_numpy() if 'Compound' in laps.columns \
+        else np.full(len(laps), 'Unknown')
+    pit_out = laps['PitOutTime'].notna().to_numpy()
+    pit_in = laps['PitInTime'].notna().to_numpy()
+
+    lap_numbers = lap.astype(int).tolist()
+    sectors = [_seconds(values) for values in durations]
+    positions = [None if np.isnan(p) else int(p) for p in position.tolist()]
+    times, order, events = [], [], []
+
+    for sector in (1, 2):
+        sector_end = _sector_end(laps, sector, start, durations)
+        for row in np.flatnonzero(~np.isnan(sector_end)):
+            times.append(sector_end[row])
+            order.append(_EVENT_ORDER['sector'])
+            events.append(('sector', {
+                "driver": driver[row], "number": number[row], "lap": lap_numbers[row],
+                "sector": sector, "time": sectors[sector - 1][row]
+            }))
+
+    lap_times = _seconds(lap_time)
+    for row in np.flatnonzero(~np.isnan(end)):
+        times.append(end[row])
+        order.append(_EVENT_ORDER['lap'])
+        events.append(('lap', {
+            "driver": driver[row], "number": number[row], "lap": lap_numbers[row],
+            "time": lap_times[row],
+            "sectors": [sectors[0][row], sectors[1][row], sectors[2][row]],
+            "position": positions[row], "compound": compound[row],
+            "pit_in": bool(pit_in[row]), "pit_out": bool(pit_out[row])
+        }))
+
+    # Position changes: a driver's position at the end of a lap against the previous lap
+    by_driver = np.lexsort((lap, number))
+    previous = np.full(len(laps), np.nan)
+    same_driver = number[by_driver][1:] == number[by_driver][:-1]
+    previous[by_driver[1:][same_driver]] = position[by_driver[:-1]][same_driver]
+    changed = ~np.isnan(end) & ~np.isnan(position) & ~np.isnan(previous) & (position != previous)
+    for row in np.flatnonzero(changed):
+        times.append(end[row])
+        order.append(_EVENT_ORDER['position'])
+        events.append(('position', {
+            "driver": driver[row], "number": number[row], "lap": lap_numbers[row],
+            "position": positions[row], "previous": int(previous[row])
+        }))
+
+    times = np.asarray(times, dtype=float)
+    sort = np.lexsort((order, times))
+    lap_starts = {}
+    known = ~np.isnan(start)
+    for lap_number, lap_start in zip(lap[known].astype(int).tolist(), start[known].tolist()):
+        lap_starts[lap_number] = min(lap_start, lap_starts.get(lap_number, lap_start))
+    return {
+        "time": times[sort],
+        "events": [events[i] for i in sort],
+        "lap_starts": lap_starts
+    }
+
+
+def sse_frame(event, data, event_id=None):
+    """One Server-Sent Events message"""
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{frame}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def replay_speed(speed):
+    """Playback speed clamped to [0.1, MAX_REPLAY_SPEED]
+
+    Raises ValueError for a non-numeric or non-finite speed.
+    """
+    speed = float(speed)
+    if not math.isfinite(speed):
+        raise ValueError(f"Invalid replay speed: {speed}")
+    return min(max(speed, 0.1), MAX_REPLAY_SPEED)
+
+
+class Replay:
+    """One producer playing a timeline into a log shared by its subscribers"""
+
+    def __init__(self, key, timeline, speed=REPLAY_SPEED, from_lap=1):
+        self.key = key
+        self.id = uuid.uuid4().hex[:8]
+        self.timeline = timeline
+        self.speed = replay_speed(speed)
+        times = timeline['time']
+        origin = times[0] if len(times) else 0.0
+        self.start = timeline['lap_starts'].get(int(from_lap), origin) if from_lap > 1 else \
+            min(timeline['lap_starts'].values(), default=origin)
+        self.clock = self.start
+        self.frames = []  # (seq, SSE frame), appended by the producer only
+        self.last_seq = 0
+        self.finished = False
+        self.subscribers = 0
+        self.standings = {}
+        self._idle_since = time.time()
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+
+    def subscribe(self):
+        with self._changed:
+            self.subscribers += 1
+
+    def unsubscribe(self):
+        with self._changed:
+            self.subscribers -= 1
+            if self.subscribers == 0:
+                self._idle_since = time.time()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """(seq, SSE frame) with the standings up to event ``seq``, sent on connect"""
+        with self._changed:
+            standings = sorted(self.standings.values(),
+                               key=lambda s: (s['position'] is None, s['position'] or 0))
+            return self.last_seq, sse_frame('snapshot', {
+                "replay": self.id,
+                "session_time": round(self.clock, 3),
+                "speed": self.speed,
+                "finished": self.finished,
+                "standings": standings
+            }, self.last_seq)
+
+    def wait(self, since, timeout=15):
+        """Frames newer than ``since``, blocking until there are some (or timeout)"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.last_seq > since or self.finished, timeout=timeout)
+            return self.frames[since:] if since < self.last_seq else []
+
+    def _apply(self, name, payload):
+        """Fold an event into the standings (lock held)"""
+        if name != 'lap':
+            return
+        standing = self.standings.setdefault(payload['driver'], {
+            "driver": payload['driver'], "number": payload['number'], "best": None
+        })
+        standing.update(lap=payload['lap'], position=payload['position'],
+                        last=payload['time'], compound=payload['compound'])
+        if payload['time'] is not None and (standing['best'] is None or payload['time'] < standing['best']):
+            standing['best'] = payload['time']
+
+    def _publish(self, name, payload, track=True):
+        with self._changed:
+            if track:
+                self._apply(name, payload)
+            self.last_seq += 1
+            self.frames.append((self.last_seq, sse_frame(name, payload, self.last_seq)))
+            # The last frame: readers stop once they have it
+            self.finished = name == 'finished'
+            self._changed.notify_all()
+
+    def run(self):
+        """Producer loop: publish every event once its session time is reached"""
+        times, events = self.timeline['time'], self.timeline['events']
+        i = int(np.searchsorted(times, self.start, side='right'))
+        with self._changed:
+            # Laps completed before the start only shape the first standings
+            for name, payload in events[:i]:
+                self._apply(name, payload)
+
+        started = time.monotonic()
+        next_tick = 0.0
+        while i < len(times) and not self._stop.is_set():
+            elapsed = time.monotonic() - started
+            self.clock = self.start + elapsed * self.speed
+            end = int(np.searchsorted(times, self.clock, side='right'))
+            for name, payload in events[i:end]:
+                self._publish(name, payload)
+            i = end
+            if elapsed >= next_tick:
+                self._publish('clock', {"session_time": round(self.clock, 3)}, track=False)
+                next_tick = elapsed + REPLAY_TICK
+            with self._changed:
+                if self.subscribers == 0 and time.time() - self._idle_since > REPLAY_IDLE_TIMEOUT:
+                    logger.info(f"Stopping idle replay {self.key}")
+                    break
+            if i < len(times):
+                until_event = (times[i] - self.clock) / self.speed
+                self._stop.wait(max(min(until_event, next_tick - elapsed), 0.01))
+
+        self._publish('finished', {"session_time": round(self.clock, 3)}, track=False)
+
+
+class ReplayHub:
+    """Shares one Replay per (session, speed, start) between all clients"""
+
+    def __init__(self, max_replays=MAX_REPLAYS, max_subscribers=MAX_LIVE_SUBSCRIBERS):
+        self.max_replays = max_replays
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.rejected = 0
+        self._replays = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, timeline, speed=REPLAY_SPEED, from_lap=1):
+        """Join the running replay for ``key`` or start one; call unsubscribe() when done"""
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                raise TooManySubscribers(f"{self.subscribers} live timing clients already connected")
+            replay = self._replays.get(key)
+            if replay is None or replay.finished:
+                if len(self._replays) >= self.max_replays:
+                    raise TooManyReplays(f"{len(self._replays)} replays already running")
+                replay = Replay(key, timeline, speed, from_lap)
+                self._replays[key] = replay
+                threading.Thread(target=self._run, args=(replay,), name=f"replay-{replay.id}",
+                                 daemon=True).start()
+            replay.subscribe()
+            self.subscribers += 1
+            return replay
+
+    def unsubscribe(self, replay):
+        """Release a client slot taken by subscribe()"""
+        replay.unsubscribe()
+        with self._lock:
+            self.subscribers -= 1
+
+    def _run(self, replay):
+        try:
+            replay.run()
+        except Exception as e:
+            logger.error(f"Replay {replay.key} failed: {str(e)}")
+            replay._publish('finished', {"session_time": round(replay.clock, 3), "error": str(e)},
+                            track=False)
+        finally:
+            with self._lock:
+                if self._replays.get(replay.key) is replay:
+                    del self._replays[replay.key]
+
+    def stop_all(self):
+        with self._lock:
+            for replay in self._replays.values():
+                replay.stop()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "replays": len(self._replays),
+                "max_replays": self.max_replays,
+                "subscribers": self.subscribers,
+                "max_subscribers": self.max_subscribers,
+                "rejected_subscribers": self.rejected
+            }
+
+
+# Shared hub used by the API server
+replay_hub = ReplayHub()
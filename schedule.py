@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Memoized FastF1 event schedules
+Past seasons never change, so they are fetched once per process
+"""
+
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+
+from session_cache import import_fastf1
+
+logger = logging.getLogger(__name__)
+
+# How long the schedule of the running season is trusted before refetching
+CURRENT_SEASON_TTL = int(os.environ.get('SCHEDULE_TTL', 60 * 60))
+
+# Sessions count as final this long after their scheduled start
+SESSION_FINAL_AFTER_HOURS = int(os.environ.get('SESSION_FINAL_AFTER_HOURS', 24))
+
+_schedules = {}
+_lock = threading.Lock()
+
+
+def current_year():
+    """Current UTC year, without importing pandas"""
+    return datetime.now(timezone.utc).year
+
+
+def utc_now():
+    """Current time as a naive UTC timestamp, like FastF1's *DateUtc columns"""
+    import pandas as pd
+    return pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+
+def get_event_schedule(year):
+    """fastf1.get_event_schedule(), memoized per year"""
+    year = int(year)
+    with _lock:
+        cached = _schedules.get(year)
+    if cached is not None:
+        schedule, fetched_at = cached
+        if year < current_year() or time.time() - fetched_at < CURRENT_SEASON_TTL:
+            return schedule
+
+    schedule = import_fastf1().get_event_schedule(year)
+    with _lock:
+        _schedules[year] = (schedule, time.time())
+    return schedule
+
+
+def race_calendar(year):
+    """Rounds with a race session as JSON-ready dicts"""
+    schedule = get_event_schedule(year)
+    races = schedule[schedule['Session5Date'].notna()]  # Has race session
+    return [
+        {
+            "round": int(round_number),
+            "name": name,
+            "location": location,
+            "country": country
+        }
+        for round_number, name, location, country in zip(
+            races['RoundNumber'], races['EventName'], races['Location'], races['Country']
+        )
+    ]
+
+
+def find_event(year, race_name):
+    """Event for a round number or (fuzzy) event name, None if not found"""
+    try:
+        schedule = get_event_schedule(year)
+        if str(race_name).isdigit():
+            return schedule.get_event_by_round(int(race_name))
+        return schedule.get_event_by_name(str(race_name))
+    except Exception as e:
+        logger.warning(f"Could not find event {year} {race_name}: {str(e)}")
+        return None
+
+
+def is_session_final(year, race_name, session_type='R'):
+    """True once a session's data can no longer change
+
+    Past seasons are decided from the year alone, without pandas or the
+    event schedule.
+    """
+    year = int(year)
+    if year < current_year():
+        return True
+    if race_name is None:
+        return False
+    import pandas as pd
+    event = find_event(year, race_name)
+    if event is None:
+        return False
+    try:
+        session_date = event.get_session_date(session_type, utc=True)
+    except ValueError:
+        return False
+    return pd.notna(session_date) and session_date + pd.Timedelta(hours=SESSION_FINAL_AFTER_HOURS) < utc_now()
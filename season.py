@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Season-wide queries across every event of a year
+Each event is reduced to a few summary rows per driver in a worker process;
+summaries of finished sessions are kept on disk and never recomputed
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from session_cache import CACHE_DIR, SESSION_FAILURE_TTL, load_fastf1_session
+from serializers import lap_columns
+from schedule import get_event_schedule, is_session_final, utc_now
+import warmup
+
+logger = logging.getLogger(__name__)
+
+SEASON_DIR = os.path.join(CACHE_DIR, 'season')
+SEASON_WORKERS = int(os.environ.get('SEASON_WORKERS', 2))
+# Bump when the summary rows change so old files are recomputed
+SUMMARY_VERSION = 1
+# Summaries of sessions that may still change are recomputed after this long
+LIVE_SUMMARY_TTL = 5 * 60
+
+
+def season_events(year, session_type='R'):
+    """(round, event name, session date) of the year's sessions that already ran"""
+    import pandas as pd
+    schedule = get_event_schedule(year)
+    now = utc_now()
+    events = []
+    for i in range(len(schedule)):
+        event = schedule.iloc[i]  # an Event, so session lookups are available
+        if int(event['RoundNumber']) == 0:
+            continue  # pre-season testing
+        try:
+            session_date = event.get_session_date(session_type, utc=True)
+        except ValueError:
+            continue
+        if pd.isna(session_date) or session_date > now:
+            continue
+        events.append((int(event['RoundNumber']), event['EventName'], session_date.isoformat()))
+    return events
+
+
+def summary_rows(session):
+    """Per-driver summary of one session: result, laps and pace"""
+    import pandas as pd
+    columns = lap_columns(session.laps)
+    # Pace excludes pit in/out laps; fastest lap counts every valid lap
+    racing = ~(columns['pit_out_time'] | columns['pit_in_time'])
+    laps = pd.DataFrame({
+        "driver": columns['driver'],
+        "time": columns['time'],
+        "lap": columns['lap'],
+        "pace": np.where(racing, columns['time'], np.nan)
+    })
+    by_driver = laps.groupby('driver', sort=False)
+    fastest = laps.loc[by_driver['time'].idxmin()].set_index('driver')
+    pace = by_driver['pace'].agg(['median', 'mean'])
+    lap_count = by_driver.size()
+
+    rows = []
+    for number in session.drivers:
+        info = session.get_driver(number)
+        code = str(info.get('Abbreviation', number))
+        position = info.get('Position', np.nan)
+        has_laps = code in lap_count.index
+        rows.append({
+            "driver": code,
+            "number": str(number),
+            "team": info.get('TeamName', 'Unknown'),
+            "position": None if pd.isna(position) else int(position),
+            "laps": int(lap_count[code]) if has_laps else 0,
+            "fastest_lap": round(float(fastest.loc[code, 'time']), 3) if has_laps else None,
+            "fastest_lap_number": int(fastest.loc[code, 'lap']) if has_laps else None,
+            "median_pace": round(float(pace.loc[code, 'median']), 3)
+                           if has_laps and pd.notna(pace.loc[code, 'median']) else None,
+            "mean_pace": round(float(pace.loc[code, 'mean']), 3)
+                         if has_laps and pd.notna(pace.loc[code, 'mean']) else None
+        })
+    return rows
+
+
+def summarize_event(year, round_number, session_type='R'):
+    """Worker task: load one session's laps and reduce it to summary rows"""
+    session = load_fastf1_session(year, round_number, session_type, tier='laps')
+    return summary_rows(session)
+
+
+class SeasonCache:
+    """Event summaries on disk plus an in-process copy"""
+
+    def __init__(self, root=SEASON_DIR, workers=SEASON_WORKERS):
+        self.root = root
+        self.workers = workers
+        self._summaries = {}
+        self._failures = {}  # key -> (error, retry after)
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    def _path(self, year, round_number, session_type):
+        return os.path.join(self.root, str(year), f"{round_number:02d}-{session_type}.json")
+
+    def get_summary(self, year, round_number, session_type):
+        """Cached summary of one event, None if it has not been computed"""
+        key = (int(year), int(round_number), session_type)
+        with self._lock:
+            cached = self._summaries.get(key)
+        if cached is not None:
+            summary, expires = cached
+            if expires is None or time.time() < expires:
+                return summary
+            with self._lock:
+                self._summaries.pop(key, None)
+            return None
+        try:
+            with open(self._path(*key)) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if summary.get('version') != SUMMARY_VERSION:
+            return None
+        with self._lock:
+            self._summaries[key] = (summary, None)
+        return summary
+
+    def put_summary(self, year, round_number, session_type, summary, persist=True):
+        """Keep a summary in memory, and on disk once the session is final"""
+        key = (int(year), int(round_number), session_type)
+        if persist:
+            path = self._path(*key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{uuid.uuid4().hex}"
+                with open(tmp_path, 'w') as f:
+                    json.dump(summary, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Error writing season summary {path}: {str(e)}")
+        with self._lock:
+            self._summaries[key] = (summary, None if persist else time.time() + LIVE_SUMMARY_TTL)
+
+    def failure(self, year, round_number, session_type):
+        """Error of a recent failed summary, None once it may be retried"""
+        key = (int(year), int(round_number), session_type)
+        with self._lock:
+            failed = self._failures.get(key)
+            if failed is not None and time.time() >= failed[1]:
+                del self._failures[key]
+                failed = None
+        return failed[0] if failed is not None else None
+
+    def missing_events(self, year, session_type='R'):
+        """(events, missing): every past event and those without a summary
+
+        Events that failed recently are not counted as missing until
+        SESSION_FAILURE_TTL has passed.
+        """
+        events = season_events(year, session_type)
+        missing = [event for event in events
+                   if self.get_summary(year, event[0], session_type) is None
+                   and self.failure(year, event[0], session_type) is None]
+        return events, missing
+
+    def refresh(self, year, session_type='R', events=None, progress=None):
+        """Compute summaries of ``events`` (default: all missing) on a process pool
+
+        Returns a status dict with the rounds computed and failed.
+        """
+        if events is None:
+            _, events = self.missing_events(year, session_type)
+        status = {"total": len(events), "done": 0, "failed": []}
+        if progress:
+            progress(dict(status))
+        if not events:
+            return status
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        started = time.time()
+        with warmup.worker_pool(self.workers, CACHE_DIR) as pool:
+            futures = {
+                pool.submit(summarize_event, year, round_number, session_type):
+                    (round_number, name, date)
+                for round_number, name, date in events
+            }
+            for future in as_completed(futures):
+                round_number, name, date = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    logger.error(f"Season summary of {year} {name} {session_type} failed: {str(e)}")
+                    status['failed'].append({"round": round_number, "error": str(e)})
+                    with self._lock:
+                        self._failures[(int(year), round_number, session_type)] = (
+                            str(e), time.time() + SESSION_FAILURE_TTL)
+                    if progress:
+                        progress(dict(status))
+                    continue
+                summary = {
+                    "version": SUMMARY_VERSION,
+                    "round": round_number,
+                    "name": name,
+                    "date": date,
+                    "session": session_type,
+                    "drivers": rows
+                }
+                # Sessions that can still change are only served from memory
+                self.put_summary(year, round_number, session_type, summary,
+                                 persist=is_session_final(year, round_number, session_type))
+                status['done'] += 1
+                if progress:
+                    progress(dict(status))
+        logger.info(f"Season {year} {session_type}: {status['done']} event(s) summarized "
+                    f"in {time.time() - started:.1f}s")
+        return status
+
+    def refresh_in_background(self, year, session_type='R'):
+        """Start refresh() in a thread unless one is running for the same season"""
+        key = (int(year), session_type)
+        with self._lock:
+            if key in self._refreshing:
+                return self._refreshing[key]
+            state = {"running": True, "total": None, "done": 0, "failed": []}
+            self._refreshing[key] = state
+
+        def run():
+            try:
+                state.update(self.refresh(year, session_type, progress=state.update))
+            except Exception as e:
+                logger.error(f"Season refresh {year} {session_type} failed: {str(e)}")
+                state['failed'].append({"error": str(e)})
+            finally:
+                state['running'] = False
+                with self._lock:
+                    self._refreshing.pop(key, None)
+
+        threading.Thread(target=run, daemon=True).start()
+        return state
+
+    def refreshing(self, year, session_type='R'):
+        with self._lock:
+            return self._refreshing.get((int(year), session_type))
+
+    def query(self, year, session_type='R', driver_codes=None):
+        """Cached summaries of a season, filtered to some drivers
+
+        Returns ``(events, pending, failed)``: summaries available now, the
+        rounds still waiting for a summary and {round: error} of rounds that
+        could not be summarized recently.
+        """
+        events, missing = self.missing_events(year, session_type)
+        missing_rounds = {event[0] for event in missing}
+        wanted = set(str(code) for code in driver_codes) if driver_codes else None
+        results = []
+        failed = {}
+        for round_number, name, date in events:
+            if round_number in missing_rounds:
+                continue
+            summary = self.get_summary(year, round_number, session_type)
+            if summary is None:
+                failed[round_number] = self.failure(year, round_number, session_type)
+                continue
+            rows = summary['drivers']
+            if wanted is not None:
+                rows = [row for row in rows if row['driver'] in wanted or row['number'] in wanted]
+            results.append({**{k: v for k, v in summary.items() if k != 'drivers'}, "drivers": rows})
+        return results, sorted(missing_rounds), failed
+
+
+# Shared season cache used by the API server
+season_cache = SeasonCache()
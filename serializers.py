@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Columnar conversion of FastF1 frames into API payloads
+Whole-column NumPy operations instead of per-row iterrows loops
+"""
+
+import numpy as np
+
+# Valid lap time window in seconds (filters out in/out laps, red flags, etc.)
+LAP_TIME_MIN = 60
+LAP_TIME_MAX = 200
+
+# Team colors for visualization
+TEAM_COLORS = {
+    'Red Bull Racing': '#0600EF',
+    'Mercedes': '#00D2BE',
+    'Ferrari': '#DC143C',
+    'McLaren': '#FF8700',
+    'Alpine': '#0077CC',
+    'AlphaTauri': '#2B4562',
+    'Aston Martin': '#006F62',
+    'Williams': '#005AFF',
+    'Alfa Romeo': '#900000',
+    'Haas': '#FFFFFF'
+}
+
+
+def timedelta_seconds(column):
+    """Convert a timedelta column to float seconds, NaT becomes NaN"""
+    import pandas as pd
+    return pd.to_timedelta(column).dt.total_seconds().to_numpy(dtype=float)
+
+
+def nullable(values):
+    """Float array to a list with NaN replaced by None (JSON null)"""
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+
+def driver_summary(session, driver_code):
+    """Name, team and color for a driver code or number"""
+    driver_info = session.get_driver(driver_code)
+    team_name = driver_info.get('TeamName', 'Unknown')
+    return {
+        "code": driver_code,
+        "name": f"{driver_info.get('FirstName', '')} {driver_info.get('LastName', '')}".strip(),
+        "team": team_name,
+        "color": TEAM_COLORS.get(team_name, '#CCCCCC')
+    }
+
+
+def lap_columns(laps):
+    """Valid laps of a Laps frame as a dict of aligned column arrays"""
+    lap_time = timedelta_seconds(laps['LapTime'])
+    # NaN compares False, so missing lap times are dropped here as well
+    valid = (lap_time > LAP_TIME_MIN) & (lap_time < LAP_TIME_MAX)
+
+    if 'Compound' in laps.columns:
+        compound = laps['Compound'].fillna('Unknown').to_numpy(dtype=object)
+    else:
+        compound = np.full(len(laps), 'Unknown', dtype=object)
+
+    return {
+        "driver": laps['Driver'].to_numpy(dtype=object)[valid],
+        "number": laps['DriverNumber'].astype(str).to_numpy(dtype=object)[valid],
+        "lap": laps['LapNumber'].to_numpy(dtype=float)[valid].astype(int),
+        "time": lap_time[valid],
+        "sector1": timedelta_seconds(laps['Sector1Time'])[valid],
+        "sector2": timedelta_seconds(laps['Sector2Time'])[valid],
+        "sector3": timedelta_seconds(laps['Sector3Time'])[valid],
+        "compound": compound[valid],
+        "pit_out_time": laps['PitOutTime'].notna().to_numpy()[valid],
+        "pit_in_time": laps['PitInTime'].notna().to_numpy()[valid]
+    }
+
+
+def lap_records(columns, mask):
+    """Row-oriented lap dicts for the rows selected by ``mask`` (or row indices)"""
+    fields = (
+        columns['lap'][mask].tolist(),
+        columns['time'][mask].tolist(),
+        nullable(columns['sector1'][mask]),
+        nullable(columns['sector2'][mask]),
+        nullable(columns['sector3'][mask]),
+        columns['compound'][mask].tolist(),
+        columns['pit_out_time'][mask].tolist(),
+        columns['pit_in_time'][mask].tolist()
+    )
+    return [
+        {
+            "lap": lap,
+            "time": time,
+            "sector1": s1,
+            "sector2": s2,
+            "sector3": s3,
+            "compound": compound,
+            "pit_out_time": pit_out,
+            "pit_in_time": pit_in
+        }
+        for lap, time, s1, s2, s3, compound, pit_out, pit_in in zip(*fields)
+    ]
+
+
+def _driver_rows(rows, driver_codes):
+    """(driver_code, table rows) for every requested driver that has valid laps
+
+    ``rows`` is the table's lap_index.LapRows.
+    """
+    for driver_code in driver_codes:
+        driver_rows = rows.driver_rows(driver_code)
+        if len(driver_rows):
+            yield driver_code, driver_rows
+
+
+def table_from_lap_columns(columns, driver_codes, summarize, rows):
+    """Valid laps of the requested drivers as numeric columns
+
+    ``rows`` maps (driver, lap) to rows of ``columns`` (lap_index.LapRows).
+    Returns ``(drivers, compounds, columns)``. The ``driver`` and ``compound``
+    columns hold indices into the ``drivers`` summaries and ``compounds``
+    names, so every column can be encoded as a plain numeric array.
+    """
+    owner = np.full(len(columns['lap']), -1)
+    drivers = []
+    for driver_code, driver_rows in _driver_rows(rows, driver_codes):
+        owner[driver_rows] = len(drivers)
+        drivers.append(summarize(driver_code))
+
+    # Keep request order of drivers, lap order within each driver
+    rows = np.flatnonzero(owner >= 0)
+    rows = rows[np.argsort(owner[rows], kind='stable')]
+    compounds, compound_index = np.unique(columns['compound'][rows].astype(str), return_inverse=True)
+
+    table = {
+        "driver": owner[rows],
+        "lap": columns['lap'][rows],
+        "time": columns['time'][rows],
+        "sector1": columns['sector1'][rows],
+        "sector2": columns['sector2'][rows],
+        "sector3": columns['sector3'][rows],
+        "compound": compound_index,
+        "pit_out_time": columns['pit_out_time'][rows],
+        "pit_in_time": columns['pit_in_time'][rows]
+    }
+    return drivers, compounds.tolist(), table
+
+
+def payload_from_lap_columns(columns, driver_codes, summarize, rows):
+    """Lap times for several drivers, keyed by the requested driver code
+
+    ``rows`` maps (driver, lap) to rows of ``columns`` (lap_index.LapRows).
+    Driver codes may be abbreviations or car numbers. Drivers without valid
+    laps are left out.
+    """
+    payload = {}
+    for driver_code, driver_rows in _driver_rows(rows, driver_codes):
+        payload[driver_code] = {
+            "driver": summarize(driver_code),
+            "laps": lap_records(columns, driver_rows)
+        }
+    return payload
+
+
+def telemetry_records(columns):
+    """Row-oriented telemetry points as served by /api/telemetry"""
+    return [
+        {
+            "distance": distance,
+            "speed": speed,
+            "throttle": throttle,
+            "brake": brake
+        }
+        for distance, speed, throttle, brake in zip(
+            columns['distance'].tolist(),
+            columns['speed'].tolist(),
+            columns['throttle'].tolist(),
+            columns['brake'].tolist()
+        )
+    ]
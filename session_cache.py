@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+In-process cache of loaded FastF1 sessions
+Shared by all API endpoints so a hot race is only parsed once per worker
+"""
+
+import copy
+import os
+import sys
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from importlib import metadata
+
+from lap_index import INDEX_ATTR, build_lap_index
+# FastF1 on-disk cache root shared by the API server, Streamlit and offline tools
+from disk_cache import CACHE_DIR, disk_cache  # noqa: F401  CACHE_DIR is re-exported
+
+logger = logging.getLogger(__name__)
+
+# Cache limits (overridable from the environment for small instances)
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', 8))
+SESSION_CACHE_MAX_MB = int(os.environ.get('SESSION_CACHE_MAX_MB', 1024))
+SESSION_CACHE_TTL = int(os.environ.get('SESSION_CACHE_TTL', 6 * 60 * 60))
+SESSION_FAILURE_TTL = int(os.environ.get('SESSION_FAILURE_TTL', 60))
+DERIVED_CACHE_MAX_ENTRIES = int(os.environ.get('DERIVED_CACHE_MAX_ENTRIES', 512))
+# Cold loads wait this long for memory to free up before they are rejected
+SESSION_ADMISSION_TIMEOUT = float(os.environ.get('SESSION_ADMISSION_TIMEOUT', 10))
+# Downgrade idle sessions to laps-only before evicting them outright
+SESSION_DOWNGRADE = os.environ.get('SESSION_DOWNGRADE', '1') != '0'
+# Seconds clients are asked to wait after a load was rejected
+SESSION_RETRY_AFTER = 30
+
+# Loading tiers, from cheapest to most complete. Each tier maps to the
+# keyword arguments passed to Session.load()
+SESSION_TIERS = ('results', 'laps', 'telemetry')
+TIER_LOAD_ARGS = {
+    'results': dict(laps=False, telemetry=False, weather=False, messages=False),
+    'laps': dict(laps=True, telemetry=False, weather=False, messages=True),
+    'telemetry': dict(laps=True, telemetry=True, weather=False, messages=True)
+}
+
+# Memory a load of each tier is expected to need until one has been measured
+TIER_ESTIMATE_BYTES = {
+    'results': 5 * 1024 * 1024,
+    'laps': 50 * 1024 * 1024,
+    'telemetry': 300 * 1024 * 1024
+}
+
+# Session attributes holding DataFrames (or dicts of DataFrames) after load()
+_SESSION_FRAMES = ('_laps', '_results', '_car_data', '_pos_data',
+                   '_weather_data', '_race_control_messages',
+                   '_session_status', '_track_status')
+# Attributes dropped when a session is downgraded to laps-only
+_TELEMETRY_FRAMES = ('_car_data', '_pos_data')
+
+
+class OverBudget(Exception):
+    """A session load does not fit in the memory budget right now"""
+
+    def __init__(self, message, retry_after=SESSION_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# FastF1 pulls in pandas and matplotlib, so it is imported on first use;
+# the version is read from package metadata without importing it
+FASTF1_VERSION = metadata.version('fastf1')
+_fastf1_cache_dir = None
+_fastf1_ready = False
+_fastf1_lock = threading.Lock()
+
+
+def use_fastf1_cache(cache_dir):
+    """Enable FastF1's disk cache in ``cache_dir`` once FastF1 is imported"""
+    global _fastf1_cache_dir, _fastf1_ready
+    with _fastf1_lock:
+        _fastf1_cache_dir = cache_dir
+        _fastf1_ready = False
+    disk_cache.use_root(cache_dir)
+
+
+def import_fastf1():
+    """The fastf1 module, imported and configured on the first call"""
+    global _fastf1_ready
+    import fastf1
+    if not _fastf1_ready:
+        with _fastf1_lock:
+            if not _fastf1_ready:
+                if _fastf1_cache_dir is not None:
+                    os.makedirs(_fastf1_cache_dir, exist_ok=True)
+                    fastf1.Cache.enable_cache(_fastf1_cache_dir)
+                _fastf1_ready = True
+    return fastf1
+
+
+def fastf1_imported():
+    """True once FastF1 has been imported in this process"""
+    return 'fastf1' in sys.modules
+
+
+def make_session_key(year, race_name, session_type='R'):
+    """Normalise request parameters into a cache key"""
+    return (int(year), str(race_name).strip().lower(), str(session_type).strip().upper())
+
+
+def key_matches(key, year=None, race_name=None, session_type=None):
+    """True if a session key matches a partial (year, race, session) filter"""
+    return ((year is None or key[0] == int(year))
+            and (race_name is None or key[1] == str(race_name).strip().lower())
+            and (session_type is None or key[2] == str(session_type).strip().upper()))
+
+
+def estimate_session_bytes(session):
+    """Estimate the resident size of a loaded session's DataFrames"""
+    total = 0
+    for attr in _SESSION_FRAMES:
+        frames = getattr(session, attr, None)
+        if frames is None:
+            continue
+        if isinstance(frames, dict):
+            frames = frames.values()
+        else:
+            frames = [frames]
+        for frame in frames:
+            try:
+                total += int(frame.memory_usage(index=True, deep=False).sum())
+            except (AttributeError, TypeError):
+                continue
+    index = getattr(session, INDEX_ATTR, None)
+    if index is not None:
+        total += index.nbytes
+    return total
+
+
+def laps_only_copy(session):
+    """Shallow copy of a loaded session without its car and position data
+
+    The session itself is left untouched, so requests still holding it keep
+    working; its telemetry is freed once the last of them lets go.
+    """
+    light = copy.copy(session)
+    for attr in _TELEMETRY_FRAMES:
+        light.__dict__.pop(attr, None)
+    laps = getattr(session, '_laps', None)
+    if laps is not None and hasattr(laps, 'session'):
+        # The laps frame points back at its session, which would keep the telemetry alive
+        light._laps = laps.copy(deep=False)
+        light._laps.session = light
+    index = getattr(session, INDEX_ATTR, None)
+    if index is not None:
+        setattr(light, INDEX_ATTR, index.without_telemetry())
+    return light
+
+
+def tier_rank(tier):
+    """Position of a tier in SESSION_TIERS, validating the name"""
+    try:
+        return SESSION_TIERS.index(tier)
+    except ValueError:
+        raise ValueError(f"Unknown session tier: {tier}")
+
+
+def load_fastf1_session(year, race_name, session_type='R', tier='telemetry', session=None):
+    """Load a session through FastF1 up to the requested tier
+
+    Passing an already loaded ``session`` upgrades it in place; FastF1 serves
+    the parts loaded before from its disk cache.
+    """
+    if session is None:
+        session = import_fastf1().get_session(year, race_name, session_type)
+    disk_cache.before_load(session)
+    session.load(**TIER_LOAD_ARGS[tier])
+    # Keep the disk cache within its budget now that the load may have grown it
+    disk_cache.maybe_enforce()
+    return session
+
+
+class _CacheEntry:
+    """A loaded session plus the bookkeeping needed for eviction"""
+
+    def __init__(self, session, tier, size_bytes):
+        self.session = session
+        self.tier = tier
+        self.size_bytes = size_bytes
+        self.loaded_at = time.time()
+        self.last_access = self.loaded_at
+
+
+class DerivedCache:
+    """Bounded LRU of small results computed from a session
+
+    Keys are tuples whose first element is the session key, so results can
+    be dropped together with the session they were derived from.
+    """
+
+    def __init__(self, max_entries=DERIVED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a cached result or None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        """Store a result, evicting the least recently used ones"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Return the cached result for ``key`` or compute and store it"""
+        value = self.get(key)
+        if value is None:
+            value = self.set(key, compute())
+        return value
+
+    def drop_sessions(self, session_keys):
+        """Remove every result derived from the given sessions"""
+        session_keys = set(session_keys)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in session_keys]:
+                del self._entries[key]
+
+    def stats(self):
+        """Snapshot of derived cache counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class SessionCache:
+    """Bounded LRU of loaded sessions with a memory budget and TTL
+
+    Every load reserves its expected size before it starts. Idle sessions
+    are downgraded to laps-only, then evicted, to make room; a load that
+    still does not fit waits for running loads to finish and is rejected
+    with OverBudget after ``admission_timeout`` seconds.
+    """
+
+    def __init__(self, max_entries=SESSION_CACHE_MAX_ENTRIES,
+                 max_bytes=SESSION_CACHE_MAX_MB * 1024 * 1024,
+                 ttl=SESSION_CACHE_TTL, loader=load_fastf1_session,
+                 failure_ttl=SESSION_FAILURE_TTL,
+                 admission_timeout=SESSION_ADMISSION_TIMEOUT,
+                 downgrade=SESSION_DOWNGRADE):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.loader = loader
+        self.admission_timeout = admission_timeout
+        self.downgrade = downgrade
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._memory = threading.Condition(self._lock)
+        self._reserved = {}    # key -> bytes set aside for a load in flight
+        self._tier_bytes = {}  # tier -> largest measured session size
+        self.derived = DerivedCache()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.downgrades = 0
+        self.expirations = 0
+        self.admission_waits = 0
+        self.rejections = 0
+        self.upgrades = 0
+        self.coalesced = 0
+        self.failed_hits = 0
+        self.failure_ttl = failure_ttl
+        self._inflight = {}
+        self._failures = {}
+
+    def get(self, year, race_name, session_type='R', tier='telemetry', timeout=None):
+        """Return a session loaded to at least ``tier``, loading it on a miss
+
+        A cached session loaded to a lower tier is upgraded in place rather
+        than reloaded from scratch. Concurrent requests for a session that is
+        already being loaded wait for that load instead of starting their own,
+        and a failed load is remembered for SESSION_FAILURE_TTL seconds.
+        Raises OverBudget if the load does not fit in memory within
+        ``timeout`` seconds (default: the cache's admission timeout).
+        """
+        key = make_session_key(year, race_name, session_type)
+        needed = tier_rank(tier)
+
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None and tier_rank(entry.tier) >= needed:
+                    self.hits += 1
+                    return entry.session
+
+                failure = self._failures.get(key)
+                if failure is not None:
+                    error, failed_at = failure
+                    if time.time() - failed_at < self.failure_ttl:
+                        self.failed_hits += 1
+                        raise error
+                    del self._failures[key]
+
+                flight = self._inflight.get(key)
+                if flight is None:
+                    # This request leads the load; others will wait on it
+                    flight = Future()
+                    self._inflight[key] = flight
+                    self.misses += 1
+                    if entry is not None:
+                        self.upgrades += 1
+                    break
+                self.coalesced += 1
+
+            # Wait for the load in progress, then re-check the tier it reached
+            flight.result()
+
+        try:
+            self._admit(key, tier, entry, timeout)
+        except OverBudget as e:
+            # Not remembered as a failure: the load may fit moments later
+            with self._lock:
+                self.rejections += 1
+                del self._inflight[key]
+            flight.set_exception(e)
+            raise
+
+        try:
+            session = self._load(key, year, race_name, session_type, tier,
+                                 entry.session if entry is not None else None)
+        except Exception as e:
+            with self._memory:
+                self._failures[key] = (e, time.time())
+                del self._inflight[key]
+                self._reserved.pop(key, None)
+                self._memory.notify_all()
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+        flight.set_result(session)
+        return session
+
+    def _load(self, key, year, race_name, session_type, tier, session):
+        """Run the loader and store the result (called by the flight leader)"""
+        started = time.time()
+        session = self.loader(year, race_name, session_type, tier=tier, session=session)
+        if tier_rank(tier) >= tier_rank('laps'):
+            # Lap and telemetry lookups slice this instead of filtering the laps frame
+            build_lap_index(session, telemetry=tier == 'telemetry')
+        size_bytes = estimate_session_bytes(session)
+        logger.info(f"Loaded session {key} to tier '{tier}' in "
+                    f"{time.time() - started:.1f}s (~{size_bytes / 1024 / 1024:.1f} MB)")
+
+        with self._memory:
+            self._entries[key] = _CacheEntry(session, tier, size_bytes)
+            self._entries.move_to_end(key)
+            self._tier_bytes[tier] = max(self._tier_bytes.get(tier, 0), size_bytes)
+            self._reserved.pop(key, None)
+            self._enforce_limits(keep=key)
+            self._memory.notify_all()
+        return session
+
+    def _tier_estimate(self, tier):
+        return self._tier_bytes.get(tier, TIER_ESTIMATE_BYTES[tier])
+
+    def _admit(self, key, tier, entry, timeout=None):
+        """Reserve memory for a load, making room or waiting for running loads
+
+        A load always starts when no other load is in flight, even if it is
+        larger than the whole budget, so a single session can always be served.
+        """
+        needed = max(self._tier_estimate(tier) - (entry.size_bytes if entry is not None else 0), 0)
+        deadline = time.time() + (self.admission_timeout if timeout is None else timeout)
+        waited = False
+        with self._memory:
+            while True:
+                self._enforce_limits(keep=key, needed=needed)
+                if self._used_bytes() + needed <= self.max_bytes or not self._reserved:
+                    self._reserved[key] = needed
+                    if waited:
+                        self.admission_waits += 1
+                    return
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning(f"Rejected load of {key}: ~{needed / 1024 / 1024:.0f} MB "
+                                   f"does not fit in the session memory budget")
+                    raise OverBudget(f"Not enough memory to load {key[0]} {key[1]} now, "
+                                     f"{len(self._reserved)} load(s) in progress")
+                waited = True
+                self._memory.wait(min(remaining, 1.0))
+
+    def peek(self, year, race_name, session_type='R', tier='results'):
+        """Return a cached session of at least ``tier`` without loading it"""
+        key = make_session_key(year, race_name, session_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or tier_rank(entry.tier) < tier_rank(tier):
+                return None
+            return entry.session
+
+    def invalidate(self, year=None, race_name=None, session_type=None):
+        """Drop cached sessions matching the given (partial) key, returns count"""
+        with self._lock:
+            doomed = [key for key in self._entries if key_matches(key, year, race_name, session_type)]
+            for key in doomed:
+                del self._entries[key]
+            for key in [k for k in self._failures if key_matches(k, year, race_name, session_type)]:
+                del self._failures[key]
+            self.derived.drop_sessions(doomed)
+            if doomed:
+                logger.info(f"Invalidated {len(doomed)} cached session(s)")
+            return len(doomed)
+
+    def clear(self):
+        """Drop every cached session"""
+        return self.invalidate()
+
+    def stats(self):
+        """Snapshot of cache counters and resident sessions"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            now = time.time()
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._total_bytes(),
+                "reserved_bytes": sum(self._reserved.values()),
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "downgrades": self.downgrades,
+                "expirations": self.expirations,
+                "admission_waits": self.admission_waits,
+                "rejections": self.rejections,
+                "upgrades": self.upgrades,
+                "coalesced": self.coalesced,
+                "failed_hits": self.failed_hits,
+                "loading": len(self._inflight),
+                "recent_failures": len(self._failures),
+                "derived": self.derived.stats(),
+                "sessions": [
+                    {
+                        "year": key[0],
+                        "race": key[1],
+                        "session": key[2],
+                        "tier": entry.tier,
+                        "bytes": entry.size_bytes,
+                        "age": round(now - entry.loaded_at, 1),
+                        "idle": round(now - entry.last_access, 1)
+                    }
+                    for key, entry in self._entries.items()
+                ]
+            }
+
+    def _lookup(self, key):
+        """Find a live entry and mark it most recently used (lock held)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.time() - entry.loaded_at > self.ttl:
+            del self._entries[key]
+            self.derived.drop_sessions([key])
+            self.expirations += 1
+            return None
+        entry.last_access = time.time()
+        self._entries.move_to_end(key)
+        return entry
+
+    def _total_bytes(self):
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _used_bytes(self):
+        """Resident plus reserved memory (lock held)"""
+        return self._total_bytes() + sum(self._reserved.values())
+
+    def _over_limits(self, needed=0):
+        return (len(self._entries) > self.max_entries
+                or self._used_bytes() + needed > self.max_bytes)
+
+    def _enforce_limits(self, keep=None, needed=0):
+        """Free memory until ``needed`` more bytes fit (lock held)
+
+        Least recently used telemetry sessions are first downgraded to
+        laps-only, then sessions are evicted. The session about to be handed
+        out and sessions being loaded are left alone.
+        """
+        for downgrade in ((True, False) if self.downgrade else (False,)):
+            for key in list(self._entries):
+                if not self._over_limits(needed):
+                    return
+                if key == keep or key in self._inflight:
+                    continue
+                entry = self._entries[key]
+                if not downgrade or len(self._entries) > self.max_entries:
+                    self._evict(key)
+                elif entry.tier == 'telemetry':
+                    self._downgrade(key, entry)
+
+    def _evict(self, key):
+        del self._entries[key]
+        self.derived.drop_sessions([key])
+        self.evictions += 1
+        self._memory.notify_all()
+        logger.info(f"Evicted session {key} from cache")
+
+    def _downgrade(self, key, entry):
+        """Swap a session for a copy without car and position data"""
+        entry.session = laps_only_copy(entry.session)
+        freed = entry.size_bytes
+        entry.tier = 'laps'
+        entry.size_bytes = estimate_session_bytes(entry.session)
+        self.downgrades += 1
+        self._memory.notify_all()
+        logger.info(f"Downgraded session {key} to laps only, "
+                    f"freed ~{(freed - entry.size_bytes) / 1024 / 1024:.1f} MB")
+
+
+# Shared cache used by the API server
+session_cache = SessionCache()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+On-disk store of pre-digested session data shared by all worker processes
+Lap tables and per-driver telemetry channels as raw .npy files, served from
+memory-mapped views so workers share pages through the OS page cache
+"""
+
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from session_cache import CACHE_DIR, key_matches, tier_rank
+from schedule import is_session_final
+from disk_cache import STORE_DIR_NAME, disk_cache
+from serializers import driver_summary, lap_columns
+from lap_index import lap_rows, lap_slots, session_lap_index, slice_lap
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.environ.get('F1_STORE_DIR', os.path.join(CACHE_DIR, STORE_DIR_NAME))
+STORE_VERSION = 1
+MAX_OPEN_SESSIONS = 32
+
+# Lap table columns written as numeric arrays
+_LAP_ARRAYS = ('driver', 'lap', 'time', 'sector1', 'sector2', 'sector3',
+               'compound', 'pit_out_time', 'pit_in_time')
+# Per-driver telemetry arrays
+_TELEMETRY_ARRAYS = ('session_time', 'speed', 'throttle', 'brake', 'cumdist', 'offsets')
+
+
+def _slug(race_name):
+    return re.sub(r'[^a-z0-9]+', '-', race_name).strip('-') or 'event'
+
+
+def session_dir(key, root=STORE_DIR):
+    """Directory of one session, from a session_cache key"""
+    year, race_name, session_type = key
+    return os.path.join(root, str(year), _slug(race_name), session_type)
+
+
+def _publish(tmp_dir, final_dir):
+    """Atomically move a fully written directory into place"""
+    try:
+        os.rename(tmp_dir, final_dir)
+    except OSError:
+        # Another worker published the same data first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _write_arrays(directory, arrays):
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(values))
+
+
+def _read_arrays(directory, names):
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in names}
+
+
+class StoredSession:
+    """Memory-mapped view of one session in the store"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self._by_code = {}
+        for number, abbreviation in zip(self.meta['numbers'], self.meta['abbreviations']):
+            self._by_code[number] = number
+            self._by_code[abbreviation] = number
+        self._laps = None
+        self._lap_rows = None
+        self._telemetry = {}
+        self._lock = threading.Lock()
+
+    @property
+    def drivers(self):
+        """Driver numbers, in session order"""
+        return list(self.meta['numbers'])
+
+    @property
+    def has_laps(self):
+        return os.path.isdir(os.path.join(self.directory, 'laps'))
+
+    @property
+    def has_telemetry(self):
+        return os.path.isdir(os.path.join(self.directory, 'telemetry'))
+
+    def driver_number(self, driver_code):
+        """Car number for an abbreviation or number, None if unknown"""
+        return self._by_code.get(str(driver_code))
+
+    def driver_summary(self, driver_code):
+        """Same dict as serializers.driver_summary()"""
+        summary = dict(self.meta['summaries'][self.driver_number(driver_code)])
+        summary['code'] = driver_code
+        return summary
+
+    def lap_columns(self):
+        """Lap table in the layout returned by serializers.lap_columns()"""
+        with self._lock:
+            if self._laps is None:
+                self._laps = _read_arrays(os.path.join(self.directory, 'laps'), _LAP_ARRAYS)
+        arrays = self._laps
+        numbers = np.array(self.meta['numbers'], dtype=object)
+        abbreviations = np.array(self.meta['abbreviations'], dtype=object)
+        compounds = np.array(self.meta['compounds'], dtype=object)
+        columns = {name: arrays[name] for name in _LAP_ARRAYS}
+        columns['number'] = numbers[arrays['driver']]
+        columns['driver'] = abbreviations[arrays['driver']]
+        columns['compound'] = compounds[arrays['compound']]
+        return columns
+
+    def lap_rows(self, columns):
+        """lap_index.LapRows over lap_columns(), built once"""
+        with self._lock:
+            if self._lap_rows is None:
+                self._lap_rows = lap_rows(columns)
+            return self._lap_rows
+
+    def _driver_arrays(self, number):
+        with self._lock:
+            if number not in self._telemetry:
+                directory = os.path.join(self.directory, 'telemetry', number)
+                if not os.path.isdir(directory):
+                    return None
+                arrays = _read_arrays(directory, _TELEMETRY_ARRAYS)
+                arrays['slots'] = lap_slots(arrays['offsets'][:, 0])
+                self._telemetry[number] = arrays
+            return self._telemetry[number]
+
+    def lap_telemetry(self, driver_code, lap_number):
+        """Telemetry columns of one lap (distance, speed, throttle and brake)"""
+        number = self.driver_number(driver_code)
+        arrays = self._driver_arrays(number) if number is not None else None
+        if arrays is None:
+            raise KeyError(f"No telemetry stored for driver {driver_code}")
+
+        slots = arrays['slots']
+        slot = slots[int(lap_number)] if 0 <= int(lap_number) < len(slots) else -1
+        if slot < 0:
+            raise KeyError(f"No lap {lap_number} stored for driver {driver_code}")
+        _, lo, hi, first_ds = arrays['offsets'][slot]
+        return slice_lap(arrays, lo, hi, first_ds)
+
+
+class SessionStore:
+    """Writes sessions into the store and hands out memory-mapped readers"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def open(self, key):
+        """StoredSession for a session key, or None if it was never written"""
+        directory = session_dir(key, self.root)
+        with self._lock:
+            stored = self._open.get(key)
+            if stored is None and os.path.exists(os.path.join(directory, 'meta.json')):
+                try:
+                    stored = StoredSession(directory)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable store entry {directory}: {e}")
+                    stored = None
+                if stored is not None and not stored.meta.get('final'):
+                    # Written while the session could still change: rewritten on the next load
+                    stored = None
+                if stored is not None:
+                    self._open[key] = stored
+                    while len(self._open) > MAX_OPEN_SESSIONS:
+                        self._open.popitem(last=False)
+            if stored is not None:
+                self._open.move_to_end(key)
+            return stored
+
+    def lookup(self, key, part):
+        """StoredSession if ``part`` ('laps' or 'telemetry') is stored, counting hits"""
+        stored = self.open(key)
+        if stored is not None and getattr(stored, f"has_{part}"):
+            self.hits += 1
+            disk_cache.record_access(stored.directory)
+            return stored
+        self.misses += 1
+        return None
+
+    def write(self, key, session, tier='laps'):
+        """Write the parts of a session loaded up to ``tier`` into the store
+
+        Only final sessions are stored; parts that are already stored are
+        left untouched, so this is cheap to call after every load. Returns
+        the StoredSession, or None if the session can still change or the
+        store could not be written (callers then serve the live session).
+        """
+        try:
+            final = is_session_final(*key)
+        except (TypeError, ValueError):
+            final = False
+        if not final:
+            return None
+
+        directory = session_dir(key, self.root)
+        try:
+            if self.open(key) is None and os.path.exists(os.path.join(directory, 'meta.json')):
+                # Left over from before the session was final
+                shutil.rmtree(directory)
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(os.path.join(directory, 'meta.json')):
+                self._write_meta(directory, session)
+            if tier_rank(tier) >= tier_rank('laps') and not os.path.isdir(os.path.join(directory, 'laps')):
+                self._write_laps(directory, session)
+            if tier == 'telemetry' and not os.path.isdir(os.path.join(directory, 'telemetry')):
+                self._write_telemetry(directory, session)
+        except OSError as e:
+            logger.error(f"Error writing session store for {key}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._open.pop(key, None)
+        return self.open(key)
+
+    def _write_meta(self, directory, session):
+        numbers = [str(number) for number in session.drivers]
+        abbreviations = [str(session.get_driver(number).get('Abbreviation', number))
+                         for number in numbers]
+        meta = {
+            "version": STORE_VERSION,
+            "final": True,
+            "numbers": numbers,
+            "abbreviations": abbreviations,
+            "summaries": {number: driver_summary(session, number) for number in numbers},
+            # Tyre compounds FastF1 reports; anything else is stored as Unknown
+            "compounds": ['HARD', 'INTERMEDIATE', 'MEDIUM', 'SOFT', 'SUPERSOFT',
+                          'ULTRASOFT', 'HYPERSOFT', 'TEST_UNKNOWN', 'WET', 'Unknown']
+        }
+        tmp_path = os.path.join(directory, f"meta.json.{uuid.uuid4().hex}")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+
+    def _write_laps(self, directory, session):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        columns = lap_columns(session.laps)
+        number_index = {number: i for i, number in enumerate(meta['numbers'])}
+        compound_index = {name: i for i, name in enumerate(meta['compounds'])}
+
+        arrays = {name: columns[name] for name in _LAP_ARRAYS}
+        arrays['driver'] = np.array([number_index.get(n, -1) for n in columns['number']], dtype=np.int16)
+        arrays['compound'] = np.array([compound_index.get(str(c), compound_index['Unknown'])
+                                       for c in columns['compound']], dtype=np.int16)
+        keep = arrays['driver'] >= 0
+        arrays = {name: values[keep] for name, values in arrays.items()}
+
+        tmp_dir = os.path.join(directory, f"laps.tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        _write_arrays(tmp_dir, arrays)
+        _publish(tmp_dir, os.path.join(directory, 'laps'))
+
+    def _write_telemetry(self, directory, session):
+        tmp_dir = os.path.join(directory, f"telemetry.tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            # Same arrays the session's lap index already holds
+            index = session_lap_index(session, telemetry=True)
+            car_data = session.car_data
+            for number in session.drivers:
+                number = str(number)
+                arrays = index.driver_arrays(number)
+                if arrays is None:
+                    if number in car_data and index.driver(number) is not None:
+                        # Never publish a telemetry directory with a driver missing
+                        raise OSError(f"No telemetry indexed for driver {number}")
+                    continue
+                driver_dir = os.path.join(tmp_dir, number)
+                os.makedirs(driver_dir)
+                _write_arrays(driver_dir, arrays)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        _publish(tmp_dir, os.path.join(directory, 'telemetry'))
+
+    def invalidate(self, year=None, race_name=None, session_type=None):
+        """Delete stored sessions matching the given (partial) key, returns count"""
+        with self._lock:
+            for key in [k for k in self._open if key_matches(k, year, race_name, session_type)]:
+                del self._open[key]
+        pattern = os.path.join(
+            self.root,
+            str(int(year)) if year is not None else '*',
+            _slug(str(race_name).strip().lower()) if race_name is not None else '*',
+            str(session_type).strip().upper() if session_type is not None else '*')
+        removed = 0
+        for directory in glob.glob(pattern):
+            if os.path.exists(os.path.join(directory, 'meta.json')):
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+                # Drop the event/season directories left empty
+                for parent in (os.path.dirname(directory), os.path.dirname(os.path.dirname(directory))):
+                    try:
+                        os.rmdir(parent)
+                    except OSError:
+                        break
+        if removed:
+            logger.info(f"Removed {removed} stored session(s)")
+        return removed
+
+    def stats(self):
+        """Snapshot of store counters"""
+        with self._lock:
+            return {
+                "root": self.root,
+                "open_sessions": len(self._open),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Shared store used by the API server
+session_store = SessionStore()
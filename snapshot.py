@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Static snapshot export
+Runs the API's extraction over whole seasons and writes compact, content-hashed
+JSON files per race plus a manifest, so the frontend can serve races from any
+static host or CDN without the Python API
+
+Usage:
+    python snapshot.py --years 2023-2024 --output data/snapshot --points 300
+
+Layout (paths relative to the output directory):
+    manifest.json                                   # short cache, lists everything below
+    2023/races.<hash>.json                          # calendar of exported races
+    2023/01-bahrain-grand-prix/drivers.<hash>.json  # same as /api/drivers
+    2023/01-bahrain-grand-prix/lap-times.<hash>.json  # /api/lap-times?drivers=all
+    2023/01-bahrain-grand-prix/stints.<hash>.json   # /api/stints
+    2023/01-bahrain-grand-prix/telemetry/<driver>.<hash>.json  # every lap, downsampled
+
+Hashed files never change, so they can be served as immutable. Races already
+exported from a final session are skipped on the next run.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import uuid
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+
+from session_cache import CACHE_DIR, load_fastf1_session, use_fastf1_cache
+from serializers import driver_summary, payload_from_lap_columns
+from lap_index import session_lap_index, slice_lap
+from downsample import MAX_POINTS, downsample_columns
+from stints import FUEL_EFFECT, stint_records, stint_table
+from schedule import is_session_final, race_calendar
+from season import season_events
+import warmup
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshot')
+MANIFEST_NAME = 'manifest.json'
+# Bump when the exported files change shape so every race is exported again
+SNAPSHOT_VERSION = 1
+DEFAULT_POINTS = 300
+HASH_LENGTH = 12
+_HASHED_FILE = re.compile(r'\.[0-9a-f]{%d}\.json$' % HASH_LENGTH)
+
+
+def event_slug(round_number, event_name):
+    """Directory name of one race, e.g. '01-bahrain-grand-prix'"""
+    slug = re.sub(r'[^a-z0-9]+', '-', str(event_name).lower()).strip('-') or 'event'
+    return f"{int(round_number):02d}-{slug}"
+
+
+def write_hashed(output_dir, stem, payload):
+    """Write compact JSON as ``<stem>.<hash>.json`` and return its relative path
+
+    Files are named after their content, so an existing file is never
+    rewritten and unchanged races keep their URLs between runs.
+    """
+    body = json.dumps(payload, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    relative = f"{stem}.{hashlib.sha256(body).hexdigest()[:HASH_LENGTH]}.json"
+    path = os.path.join(output_dir, relative)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+    return relative
+
+
+def driver_telemetry_payload(arrays, points):
+    """Downsampled telemetry of every lap of one driver, one array per channel
+
+    ``arrays`` come from the session's lap index; laps are sliced exactly like
+    the API's stored sessions and decimated with the same LTTB selection as
+    ``/api/telemetry?points=``.
+    """
+    laps = {}
+    for lap_number, lo, hi, first_ds in arrays['offsets']:
+        columns = downsample_columns(slice_lap(arrays, lo, hi, first_ds), points=points)
+        if not len(columns['distance']):
+            continue
+        laps[str(int(lap_number))] = {
+            "distance": np.round(columns['distance'], 1).tolist(),
+            "speed": np.round(columns['speed'], 1).tolist(),
+            "throttle": np.round(columns['throttle']).astype(int).tolist(),
+            "brake": columns['brake'].astype(int).tolist()
+        }
+    return laps
+
+
+def export_event(output_dir, year, round_number, event_name, points=DEFAULT_POINTS, telemetry=True):
+    """Worker task: load one race and write its files, returns their paths"""
+    started = time.time()
+    session = load_fastf1_session(year, round_number, 'R', tier='telemetry' if telemetry else 'laps')
+    stem = f"{year}/{event_slug(round_number, event_name)}"
+    drivers = [str(number) for number in session.drivers]
+    summarize = partial(driver_summary, session)
+    index = session_lap_index(session, telemetry=telemetry)
+    columns = index.columns
+
+    files = {
+        "drivers": write_hashed(output_dir, f"{stem}/drivers", [summarize(number) for number in drivers]),
+        "lap_times": write_hashed(output_dir, f"{stem}/lap-times",
+                                  payload_from_lap_columns(columns, drivers, summarize, index.laps)),
+        "stints": write_hashed(output_dir, f"{stem}/stints", {
+            "fuel_effect": FUEL_EFFECT,
+            "stints": stint_records(stint_table(columns))
+        }),
+        "telemetry": {}
+    }
+    if telemetry:
+        for number in drivers:
+            arrays = index.driver_arrays(number)
+            if arrays is None:
+                continue
+            payload = driver_telemetry_payload(arrays, points)
+            files['telemetry'][number] = write_hashed(output_dir, f"{stem}/telemetry/{number}", payload)
+    return files, time.time() - started
+
+
+class SnapshotManifest:
+    """Exported races and their files, written after every race so a run can resume"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.data = {"version": SNAPSHOT_VERSION, "years": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable snapshot manifest: {e}")
+
+    def race(self, year, round_number):
+        for race in self.data['years'].get(str(year), {}).get('races', []):
+            if race['round'] == round_number:
+                return race
+        return None
+
+    def is_current(self, year, round_number, points, telemetry):
+        """True if a race was exported from its final session with these settings"""
+        race = self.race(year, round_number)
+        return (race is not None and race.get('version') == SNAPSHOT_VERSION
+                and race.get('final') and race.get('points') == points
+                and (bool(race['files']['telemetry']) or not telemetry))
+
+    def set_race(self, year, race):
+        """Add or replace one race, keeping the season in round order"""
+        season = self.data['years'].setdefault(str(year), {"races": []})
+        season['races'] = sorted([r for r in season['races'] if r['round'] != race['round']] + [race],
+                                 key=lambda r: r['round'])
+        season['calendar'] = write_hashed(self.output_dir, f"{year}/races", [
+            {key: r[key] for key in ('round', 'name', 'location', 'country')} for r in season['races']
+        ])
+        self.save()
+
+    def save(self):
+        self.data['version'] = SNAPSHOT_VERSION
+        self.data['generated'] = datetime.utcnow().isoformat(timespec='seconds')
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def referenced(self):
+        """Relative paths of every file the manifest points to"""
+        paths = set()
+        for season in self.data['years'].values():
+            if season.get('calendar'):
+                paths.add(season['calendar'])
+            for race in season['races']:
+                files = race['files']
+                paths.update(files[kind] for kind in ('drivers', 'lap_times', 'stints'))
+                paths.update(files['telemetry'].values())
+        return paths
+
+
+def prune(output_dir, manifest):
+    """Delete hashed files no longer referenced by the manifest, returns the count"""
+    keep = manifest.referenced()
+    removed = 0
+    for directory, _, names in os.walk(output_dir):
+        for name in names:
+            relative = os.path.relpath(os.path.join(directory, name), output_dir).replace(os.sep, '/')
+            if _HASHED_FILE.search(name) and relative not in keep:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    return removed
+
+
+def run_export(years, output_dir=SNAPSHOT_DIR, points=DEFAULT_POINTS, workers=warmup.DEFAULT_WORKERS,
+               cache_dir=CACHE_DIR, telemetry=True, force=False, progress=None):
+    """Export every past race of the given seasons, returns a summary dict
+
+    Races already exported from their final session with the same settings
+    are skipped; newer races and races that were still live are (re)exported.
+    """
+    points = min(int(points), MAX_POINTS)
+    use_fastf1_cache(cache_dir)
+    manifest = SnapshotManifest(output_dir)
+
+    tasks = []
+    for year in years:
+        calendar = {race['round']: race for race in race_calendar(year)}
+        for round_number, event_name, date in season_events(year, 'R'):
+            if round_number in calendar:
+                tasks.append((year, round_number, event_name, date, calendar[round_number]))
+    pending = [task for task in tasks
+               if force or not manifest.is_current(task[0], task[1], points, telemetry)]
+    status = {"total": len(tasks), "skipped": len(tasks) - len(pending), "done": 0, "failed": []}
+    logger.info(f"Snapshot: {len(pending)} of {len(tasks)} races to export with {workers} worker(s)")
+    if progress:
+        progress(dict(status))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=warmup._init_worker,
+                             initargs=(cache_dir,)) as pool:
+        futures = {
+            pool.submit(export_event, output_dir, year, round_number, event_name, points, telemetry):
+                (year, round_number, event_name, date, calendar_entry)
+            for year, round_number, event_name, date, calendar_entry in pending
+        }
+        for future in as_completed(futures):
+            year, round_number, event_name, date, calendar_entry = futures[future]
+            try:
+                files, seconds = future.result()
+            except Exception as e:
+                status['failed'].append({"race": f"{year}/{round_number:02d}", "error": str(e)})
+                logger.error(f"Failed to export {year} {event_name}: {str(e)}")
+            else:
+                manifest.set_race(year, {
+                    **calendar_entry,
+                    "date": date,
+                    "version": SNAPSHOT_VERSION,
+                    "final": is_session_final(year, round_number),
+                    "points": points,
+                    "files": files
+                })
+                status['done'] += 1
+                logger.info(f"[{status['done'] + len(status['failed'])}/{len(pending)}] "
+                            f"{year} {event_name} exported in {seconds:.1f}s")
+            if progress:
+                progress(dict(status))
+
+    status['manifest'] = manifest
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export races as static, content-hashed JSON files")
+    parser.add_argument('--years', required=True, help="e.g. 2023 or 2021-2023")
+    parser.add_argument('--output', default=SNAPSHOT_DIR, help="Snapshot directory")
+    parser.add_argument('--points', type=int, default=DEFAULT_POINTS,
+                        help="Telemetry samples kept per lap")
+    parser.add_argument('--workers', type=int, default=warmup.DEFAULT_WORKERS)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-telemetry', action='store_true', help="Only export lap data")
+    parser.add_argument('--force', action='store_true', help="Export races already up to date")
+    parser.add_argument('--prune', action='store_true',
+                        help="Delete files no longer referenced by the manifest")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    status = run_export(
+        warmup.parse_years(args.years),
+        output_dir=args.output,
+        points=args.points,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        telemetry=not args.no_telemetry,
+        force=args.force
+    )
+    removed = prune(args.output, status['manifest']) if args.prune else 0
+    print(f"Snapshot finished: {status['done']} exported, {status['skipped']} up to date, "
+          f"{len(status['failed'])} failed" + (f", {removed} stale file(s) removed" if args.prune else ""))
+    return 1 if status['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
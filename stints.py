@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Stint detection and tyre degradation fits
+Every stint of a session is split and fitted in one batched NumPy pass over
+the lap columns from serializers.lap_columns()
+"""
+
+import os
+
+import numpy as np
+
+# Lap time gained per lap from burning fuel (s/lap); taken out of every lap
+# (relative to the last lap's fuel load) so the slope reflects tyre wear only
+FUEL_EFFECT = float(os.environ.get('FUEL_EFFECT_PER_LAP', 0.03))
+# Laps slower than this multiple of the stint's best lap are left out of
+# the fit (safety cars, traffic, mistakes)
+OUTLIER_RATIO = 1.07
+# Fewer clean laps than this and no slope is reported
+MIN_FIT_LAPS = 3
+
+
+def _group_sum(values, groups, n_groups):
+    return np.bincount(groups, weights=values, minlength=n_groups)
+
+
+def split_stints(columns):
+    """Stint number of every lap, with laps ordered by driver then lap
+
+    Returns ``(order, stint_id)``: ``order`` sorts the lap columns and
+    ``stint_id`` numbers stints across the whole session. A stint starts at
+    a driver's first lap, a pit out-lap, the lap after a pit in-lap, or a
+    change of compound.
+    """
+    order = np.lexsort((columns['lap'], columns['number'].astype(str)))
+    number = columns['number'][order]
+    compound = columns['compound'][order].astype(str)
+    pit_out = np.asarray(columns['pit_out_time'], dtype=bool)[order]
+    pit_in = np.asarray(columns['pit_in_time'], dtype=bool)[order]
+
+    new_stint = np.ones(len(order), dtype=bool)
+    new_stint[1:] = ((number[1:] != number[:-1])
+                     | (compound[1:] != compound[:-1])
+                     | pit_out[1:]
+                     | pit_in[:-1])
+    return order, np.cumsum(new_stint) - 1
+
+
+def stint_table(columns, fuel_effect=FUEL_EFFECT):
+    """One row per stint with fuel-corrected degradation fits
+
+    Columns: driver, number, stint (per driver, from 1), compound,
+    start_lap, end_lap, laps, fit_laps, mean_time, best_time,
+    degradation (s/lap of tyre age, fuel corrected), raw_slope (s/lap
+    without fuel correction) and intercept (fitted corrected time on the
+    stint's first lap). Slopes are NaN for stints with too few clean laps.
+    """
+    if not len(columns['lap']):
+        return {name: np.zeros(0) for name in (
+            'driver', 'number', 'stint', 'compound', 'start_lap', 'end_lap', 'laps', 'fit_laps',
+            'mean_time', 'best_time', 'degradation', 'raw_slope', 'intercept')}
+
+    order, stint_id = split_stints(columns)
+    n_stints = stint_id[-1] + 1
+    lap = columns['lap'][order].astype(float)
+    time = columns['time'][order]
+    starts = np.flatnonzero(np.diff(stint_id, prepend=-1))
+
+    # Tyre age within the stint and time with the fuel effect removed
+    age = lap - lap[starts][stint_id]
+    race_laps = lap.max()
+    corrected = time - fuel_effect * (race_laps - lap)
+
+    pit_lap = (np.asarray(columns['pit_out_time'], dtype=bool)[order]
+               | np.asarray(columns['pit_in_time'], dtype=bool)[order])
+    best = np.fmin.reduceat(np.where(pit_lap, np.nan, time), starts)
+    clean = (~pit_lap & (lap > 1) & ~np.isnan(time)
+             & (time <= OUTLIER_RATIO * np.nan_to_num(best, nan=np.inf)[stint_id]))
+
+    # Least squares slope of every stint at once from grouped sums
+    groups = stint_id[clean]
+    x, y, y_raw = age[clean], corrected[clean], time[clean]
+    n = np.bincount(groups, minlength=n_stints).astype(float)
+    sx = _group_sum(x, groups, n_stints)
+    sy = _group_sum(y, groups, n_stints)
+    sxx = _group_sum(x * x, groups, n_stints)
+    sxy = _group_sum(x * y, groups, n_stints)
+    sxy_raw = _group_sum(x * y_raw, groups, n_stints)
+    sy_raw = _group_sum(y_raw, groups, n_stints)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = n * sxx - sx * sx
+        fit = (n >= MIN_FIT_LAPS) & (denominator > 0)
+        degradation = np.where(fit, (n * sxy - sx * sy) / denominator, np.nan)
+        raw_slope = np.where(fit, (n * sxy_raw - sx * sy_raw) / denominator, np.nan)
+        intercept = np.where(fit, (sy - degradation * sx) / n, np.nan)
+
+    number = columns['number'][order][starts]
+    first_stint = np.flatnonzero(np.r_[True, number[1:] != number[:-1]])
+    driver_stint = np.arange(n_stints) - np.repeat(first_stint, np.diff(np.r_[first_stint, n_stints]))
+
+    return {
+        "driver": columns['driver'][order][starts],
+        "number": number,
+        "stint": driver_stint + 1,
+        "compound": columns['compound'][order][starts].astype(str),
+        "start_lap": lap[starts].astype(int),
+        "end_lap": np.maximum.reduceat(lap, starts).astype(int),
+        "laps": np.bincount(stint_id, minlength=n_stints),
+        "fit_laps": n.astype(int),
+        "mean_time": np.add.reduceat(time, starts) / np.diff(np.r_[starts, len(time)]),
+        "best_time": best,
+        "degradation": degradation,
+        "raw_slope": raw_slope,
+        "intercept": intercept
+    }
+
+
+def stint_records(table, driver_codes=None):
+    """JSON-ready stint rows, optionally only for some drivers (codes or numbers)"""
+    rows = np.arange(len(table['stint']))
+    if driver_codes is not None:
+        wanted = [str(code) for code in driver_codes]
+        rows = rows[np.isin(table['driver'], wanted) | np.isin(table['number'], wanted)]
+
+    def rounded(name, digits=4):
+        values = np.round(table[name][rows].astype(float), digits)
+        return [None if np.isnan(value) else value for value in values.tolist()]
+
+    fields = (
+        table['driver'][rows].tolist(),
+        table['stint'][rows].tolist(),
+        table['compound'][rows].tolist(),
+        table['start_lap'][rows].tolist(),
+        table['end_lap'][rows].tolist(),
+        table['laps'][rows].tolist(),
+        table['fit_laps'][rows].tolist(),
+        rounded('mean_time', 3),
+        rounded('best_time', 3),
+        rounded('degradation'),
+        rounded('raw_slope'),
+        rounded('intercept', 3)
+    )
+    return [
+        {
+            "driver": driver,
+            "stint": stint,
+            "compound": compound,
+            "start_lap": start_lap,
+            "end_lap": end_lap,
+            "laps": laps,
+            "fit_laps": fit_laps,
+            "mean_time": mean_time,
+            "best_time": best_time,
+            "degradation": degradation,
+            "raw_slope": raw_slope,
+            "intercept": intercept
+        }
+        for (driver, stint, compound, start_lap, end_lap, laps, fit_laps,
+             mean_time, best_time, degradation, raw_slope, intercept) in zip(*fields)
+    ]
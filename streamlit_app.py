@@ -7,6 +7,40 @@ import fastf1
 import fastf1.plotting
 from datetime import datetime
 import numpy as np
+import os
+
+from session_cache import (CACHE_DIR, SESSION_CACHE_TTL, import_fastf1, load_fastf1_session,
+                           make_session_key, use_fastf1_cache)
+from lap_index import session_lap_index, slice_lap
+from downsample import resample_distance
+from serializers import lap_columns, timedelta_seconds
+from stints import FUEL_EFFECT, stint_table
+
+# Loaded sessions are held by reference (never pickled or copied). A race
+# with telemetry takes a few hundred MB, so only a handful are kept
+MAX_SESSIONS = int(os.environ.get('STREAMLIT_MAX_SESSIONS', 3))
+# Small frames derived from a session (filtered laps, one lap's telemetry)
+DERIVED_MAX_ENTRIES = int(os.environ.get('STREAMLIT_DERIVED_MAX_ENTRIES', 256))
+
+# Telemetry index resolution: every lap is resampled onto a grid of this many metres
+TELEMETRY_STEP = float(os.environ.get('STREAMLIT_TELEMETRY_STEP', 5))
+
+# Lap columns used by the charts; times are converted to float seconds
+LAP_COLUMNS = ['Driver', 'LapNumber', 'LapTime', 'Sector1Time', 'Sector2Time',
+               'Sector3Time', 'Position', 'Compound']
+TIME_COLUMNS = ['LapTime', 'Sector1Time', 'Sector2Time', 'Sector3Time']
+
+# Tyre colours used in the stint charts
+COMPOUND_COLORS = {
+    'SOFT': '#DA291C',
+    'MEDIUM': '#FFD12E',
+    'HARD': '#F0F0EC',
+    'INTERMEDIATE': '#43B02A',
+    'WET': '#0067AD'
+}
+
+# One colour per driver, the same in every chart (enough for a full grid)
+DRIVER_COLORS = px.colors.qualitative.Dark24
 
 # Configure Streamlit page
 st.set_page_config(
@@ -41,21 +75,113 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize FastF1 cache
-@st.cache_data
+@st.cache_resource
 def setup_fastf1():
-    fastf1.Cache.enable_cache('cache')
+    # Same cache root (and disk budget) as the Flask API
+    use_fastf1_cache(CACHE_DIR)
+    import_fastf1()
     fastf1.plotting.setup_mpl()
 
 # Load race session
-@st.cache_data
+@st.cache_resource(max_entries=MAX_SESSIONS, ttl=SESSION_CACHE_TTL, show_spinner=False)
 def load_session(year, gp, session_type='R'):
-    try:
-        session = fastf1.get_session(year, gp, session_type)
-        session.load()
-        return session
-    except Exception as e:
-        st.error(f"Error loading session: {e}")
-        return None
+    """Fully loaded session, shared by all reruns and users
+    
+    Failures raise instead of returning None so they are not cached.
+    """
+    return load_fastf1_session(year, gp, session_type, tier='telemetry')
+
+# Derived frames are keyed by the session key; the session itself is passed
+# as an unhashed argument. Plain DataFrames are returned because FastF1's
+# Laps/Telemetry keep a reference to the session and would pickle all of it
+@st.cache_data(max_entries=DERIVED_MAX_ENTRIES, ttl=SESSION_CACHE_TTL, show_spinner=False)
+def get_driver_list(session_key, _session):
+    return list(_session.laps['Driver'].dropna().unique())
+
+@st.cache_data(max_entries=DERIVED_MAX_ENTRIES, ttl=SESSION_CACHE_TTL, show_spinner=False)
+def get_lap_table(session_key, _session):
+    """Numeric lap table of the whole field (times in float seconds)"""
+    laps = _session.laps
+    table = pd.DataFrame({column: laps[column].to_numpy() for column in LAP_COLUMNS
+                          if column in laps.columns})
+    for column in TIME_COLUMNS:
+        if column in table:
+            table[column] = timedelta_seconds(laps[column])
+    return table.sort_values(['Driver', 'LapNumber'], kind='stable').reset_index(drop=True)
+
+@st.cache_data(max_entries=DERIVED_MAX_ENTRIES, ttl=SESSION_CACHE_TTL, show_spinner=False)
+def get_filtered_laps(session_key, drivers, _session):
+    """Lap table rows of a set of drivers"""
+    table = get_lap_table(session_key, _session)
+    return table[table['Driver'].isin(drivers)].reset_index(drop=True)
+
+@st.cache_data(max_entries=DERIVED_MAX_ENTRIES, ttl=SESSION_CACHE_TTL, show_spinner=False)
+def get_stint_table(session_key, _session):
+    """Stints and fuel-corrected degradation of the whole field"""
+    return pd.DataFrame(stint_table(lap_columns(_session.laps)))
+
+def grouped_trace(frame, x, y, by='Driver'):
+    """x/y arrays of several groups joined into one trace, NaN-separated
+    
+    Plotly breaks lines at NaN, so one trace draws every group as a separate
+    line. ``frame`` must be sorted by ``by``.
+    """
+    breaks = np.flatnonzero(frame[by].to_numpy()[1:] != frame[by].to_numpy()[:-1]) + 1
+    xs = np.insert(frame[x].to_numpy(dtype=float), breaks, np.nan)
+    ys = np.insert(frame[y].to_numpy(dtype=float), breaks, np.nan)
+    return xs, ys
+
+def driver_colors(drivers):
+    return {driver: DRIVER_COLORS[i % len(DRIVER_COLORS)] for i, driver in enumerate(drivers)}
+
+def driver_traces(frame, x, y, drivers, **trace_args):
+    """One WebGL line per driver (in ``drivers`` order) from numeric columns
+    
+    Built with graph_objects directly: plotly.express re-groups and validates
+    the whole frame on every call, which dominates rerun time for a full grid.
+    """
+    colors = driver_colors(drivers)
+    by_driver = dict(tuple(frame.groupby('Driver', sort=False)))
+    return [
+        go.Scattergl(
+            x=by_driver[driver][x].to_numpy(dtype=float),
+            y=by_driver[driver][y].to_numpy(dtype=float),
+            name=driver,
+            legendgroup=driver,
+            mode='lines',
+            line=dict(width=2, color=colors[driver]),
+            **trace_args
+        )
+        for driver in drivers if driver in by_driver
+    ]
+
+@st.cache_resource(max_entries=MAX_SESSIONS, ttl=SESSION_CACHE_TTL, show_spinner=False)
+def get_telemetry_index(session_key, _session):
+    """Every lap of every driver as distance-aligned channel arrays
+    
+    Returns {driver: {lap number: {distance, speed, throttle, brake}}}. Each
+    driver's car data is integrated once and sliced per lap, then resampled
+    onto a shared TELEMETRY_STEP grid, so no per-lap FastF1 merge is needed
+    and laps of different drivers line up point for point.
+    """
+    lap_index = session_lap_index(_session, telemetry=True)
+    index = {}
+    for number in _session.drivers:
+        number = str(number)
+        arrays = lap_index.driver_arrays(number)
+        if arrays is None or not len(arrays['offsets']):
+            continue
+        driver_index = {}
+        for lap_number, lo, hi, first_ds in arrays['offsets']:
+            if hi - lo < 2:
+                continue
+            columns = resample_distance(slice_lap(arrays, lo, hi, first_ds), TELEMETRY_STEP)
+            driver_index[int(lap_number)] = {
+                name: values if values.dtype == bool else values.astype(np.float32)
+                for name, values in columns.items()
+            }
+        index[str(lap_index.abbreviations[lap_index.driver(number)])] = driver_index
+    return index
 
 # Get available years and races
 @st.cache_data
@@ -131,16 +257,24 @@ def main():
     # Load button
     if st.sidebar.button("🚀 Load Race Data", type="primary"):
         with st.spinner(f"Loading {selected_race_name} {selected_year} data..."):
-            session = load_session(selected_year, selected_race, session_type)
-            
-            if session is not None:
-                st.session_state.session = session
+            try:
+                load_session(selected_year, selected_race, session_type)
+                # Only the key is kept per user; the session lives in the resource cache
+                st.session_state.session_args = (selected_year, selected_race, session_type)
                 st.session_state.race_info = f"{selected_year} {selected_race_name} GP"
                 st.success(f"✅ Loaded {selected_year} {selected_race_name} GP successfully!")
+            except Exception as e:
+                st.error(f"Error loading session: {e}")
     
     # Display race data if loaded
-    if hasattr(st.session_state, 'session') and st.session_state.session is not None:
-        display_race_analysis(st.session_state.session, st.session_state.race_info)
+    if st.session_state.get('session_args') is not None:
+        try:
+            session = load_session(*st.session_state.session_args)
+        except Exception as e:
+            st.error(f"Error loading session: {e}")
+            return
+        session_key = make_session_key(*st.session_state.session_args)
+        display_race_analysis(session, session_key, st.session_state.race_info)
     else:
         # Welcome screen
         st.info("👆 Select a race from the sidebar and click 'Load Race Data' to begin analysis")
@@ -148,18 +282,16 @@ def main():
         # Sample visualizations
         show_sample_data()
 
-def display_race_analysis(session, race_info):
+def display_race_analysis(session, session_key, race_info):
     st.header(f"📊 Analysis: {race_info}")
     
-    # Get lap times data
-    laps = session.laps
+    # Driver selection
+    available_drivers = get_driver_list(session_key, session)
     
-    if len(laps) == 0:
+    if len(available_drivers) == 0:
         st.warning("No lap data available for this session")
         return
     
-    # Driver selection
-    available_drivers = laps['Driver'].unique()
     selected_drivers = st.multiselect(
         "🏎️ Select Drivers to Compare",
         available_drivers,
@@ -170,38 +302,39 @@ def display_race_analysis(session, race_info):
         st.warning("Please select at least one driver")
         return
     
+    # Cached per (session, driver set): reruns reuse the same small frame
+    filtered_laps = get_filtered_laps(session_key, tuple(selected_drivers), session)
+    lap_table = get_lap_table(session_key, session)
+    
     # Create tabs for different analyses
-    tab1, tab2, tab3, tab4 = st.tabs(["🏁 Lap Times", "⚡ Sector Analysis", "🎯 Position Changes", "📈 Telemetry"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🏁 Lap Times", "⚡ Sector Analysis", "🎯 Position Changes",
+                                            "📈 Telemetry", "🛞 Stints"])
     
     with tab1:
-        show_lap_times_analysis(laps, selected_drivers)
+        show_lap_times_analysis(filtered_laps, selected_drivers)
     
     with tab2:
-        show_sector_analysis(laps, selected_drivers)
+        show_sector_analysis(filtered_laps, selected_drivers)
     
     with tab3:
-        show_position_analysis(laps, selected_drivers)
+        show_position_analysis(filtered_laps, selected_drivers, lap_table)
     
     with tab4:
-        show_telemetry_analysis(session, selected_drivers)
+        show_telemetry_analysis(session, session_key, selected_drivers)
+    
+    with tab5:
+        show_stint_analysis(get_stint_table(session_key, session), selected_drivers)
 
-def show_lap_times_analysis(laps, selected_drivers):
+def show_lap_times_analysis(filtered_laps, selected_drivers):
     st.subheader("🏁 Lap Time Comparison")
     
-    # Filter data for selected drivers
-    filtered_laps = laps[laps['Driver'].isin(selected_drivers)]
-    
-    # Create lap times chart
-    fig = px.line(
-        filtered_laps,
-        x='LapNumber',
-        y='LapTime',
-        color='Driver',
-        title='Lap Times Throughout the Race',
-        labels={'LapTime': 'Lap Time (seconds)', 'LapNumber': 'Lap Number'}
-    )
+    # Create lap times chart (WebGL, float seconds)
+    fig = go.Figure(driver_traces(filtered_laps, 'LapNumber', 'LapTime', selected_drivers))
     
     fig.update_layout(
+        title='Lap Times Throughout the Race',
+        xaxis_title='Lap Number',
+        yaxis_title='Lap Time (seconds)',
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)',
         font_color='white'
@@ -212,24 +345,24 @@ def show_lap_times_analysis(laps, selected_drivers):
     # Fastest lap statistics
     st.subheader("⚡ Fastest Lap Statistics")
     
+    fastest = filtered_laps.dropna(subset=['LapTime'])
+    fastest = fastest.loc[fastest.groupby('Driver')['LapTime'].idxmin()].set_index('Driver')
+    
     cols = st.columns(len(selected_drivers))
     for i, driver in enumerate(selected_drivers):
-        driver_laps = filtered_laps[filtered_laps['Driver'] == driver]
-        if len(driver_laps) > 0:
-            fastest_lap = driver_laps.loc[driver_laps['LapTime'].idxmin()]
+        if driver in fastest.index:
+            fastest_lap = fastest.loc[driver]
             
             with cols[i]:
                 st.metric(
                     f"🏎️ {driver}",
                     f"{fastest_lap['LapTime']:.3f}s",
-                    f"Lap {fastest_lap['LapNumber']}"
+                    f"Lap {int(fastest_lap['LapNumber'])}"
                 )
 
-def show_sector_analysis(laps, selected_drivers):
+def show_sector_analysis(filtered_laps, selected_drivers):
     st.subheader("⚡ Sector Time Analysis")
     
-    filtered_laps = laps[laps['Driver'].isin(selected_drivers)]
-    
     # Create subplot for each sector
     fig = make_subplots(
         rows=1, cols=3,
@@ -237,41 +370,11 @@ def show_sector_analysis(laps, selected_drivers):
         shared_yaxes=True
     )
     
-    for driver in selected_drivers:
-        driver_laps = filtered_laps[filtered_laps['Driver'] == driver]
-        
-        if len(driver_laps) > 0:
-            fig.add_trace(
-                go.Scatter(
-                    x=driver_laps['LapNumber'],
-                    y=driver_laps['Sector1Time'],
-                    name=f"{driver} S1",
-                    line=dict(width=2)
-                ),
-                row=1, col=1
-            )
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=driver_laps['LapNumber'],
-                    y=driver_laps['Sector2Time'],
-                    name=f"{driver} S2",
-                    line=dict(width=2),
-                    showlegend=False
-                ),
-                row=1, col=2
-            )
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=driver_laps['LapNumber'],
-                    y=driver_laps['Sector3Time'],
-                    name=f"{driver} S3",
-                    line=dict(width=2),
-                    showlegend=False
-                ),
-                row=1, col=3
-            )
+    # WebGL traces; a driver's three sectors share one legend entry and colour
+    for sector in (1, 2, 3):
+        for trace in driver_traces(filtered_laps, 'LapNumber', f'Sector{sector}Time',
+                                   selected_drivers, showlegend=sector == 1):
+            fig.add_trace(trace, row=1, col=sector)
     
     fig.update_layout(
         title="Sector Times Comparison",
@@ -282,18 +385,23 @@ def show_sector_analysis(laps, selected_drivers):
     
     st.plotly_chart(fig, use_container_width=True)
 
-def show_position_analysis(laps, selected_drivers):
+def show_position_analysis(filtered_laps, selected_drivers, lap_table):
     st.subheader("🎯 Position Changes Throughout Race")
     
-    filtered_laps = laps[laps['Driver'].isin(selected_drivers)]
+    # The rest of the field as a single background trace, drawn first
+    traces = []
+    others = lap_table[~lap_table['Driver'].isin(selected_drivers)]
+    if len(others) > 0:
+        x, y = grouped_trace(others, 'LapNumber', 'Position')
+        traces.append(go.Scattergl(x=x, y=y, mode='lines', name='Other drivers', hoverinfo='skip',
+                                   line=dict(width=1, color='rgba(160,160,160,0.35)')))
+    traces += driver_traces(filtered_laps, 'LapNumber', 'Position', selected_drivers)
     
-    fig = px.line(
-        filtered_laps,
-        x='LapNumber',
-        y='Position',
-        color='Driver',
+    fig = go.Figure(traces)
+    fig.update_layout(
         title='Race Position Changes',
-        labels={'Position': 'Race Position', 'LapNumber': 'Lap Number'}
+        xaxis_title='Lap Number',
+        yaxis_title='Race Position'
     )
     
     # Invert y-axis so position 1 is at the top
@@ -307,43 +415,111 @@ def show_position_analysis(laps, selected_drivers):
     
     st.plotly_chart(fig, use_container_width=True)
 
-def show_telemetry_analysis(session, selected_drivers):
+def show_stint_analysis(stints, selected_drivers):
+    st.subheader("🛞 Stints & Tyre Degradation")
+    
+    stints = stints[stints['driver'].isin(selected_drivers)]
+    if len(stints) == 0:
+        st.info("No stints available for selected drivers")
+        return
+    
+    # Stint timeline: one horizontal bar per stint, coloured by compound
+    fig = go.Figure()
+    for compound, group in stints.groupby('compound', sort=False):
+        fig.add_trace(go.Bar(
+            y=group['driver'],
+            x=group['end_lap'] - group['start_lap'] + 1,
+            base=group['start_lap'],
+            orientation='h',
+            name=compound,
+            marker=dict(color=COMPOUND_COLORS.get(compound, '#888888')),
+            customdata=group['end_lap'],
+            hovertemplate="Laps %{base}-%{customdata}<extra>" + compound + "</extra>"
+        ))
+    
+    fig.update_layout(
+        title='Stint Timeline',
+        xaxis_title='Lap Number',
+        barmode='overlay',
+        yaxis=dict(categoryorder='array', categoryarray=list(selected_drivers)[::-1]),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='white'
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Degradation per stint
+    fitted = stints.dropna(subset=['degradation'])
+    fig = go.Figure(go.Bar(
+        x=fitted['driver'] + ' S' + fitted['stint'].astype(str),
+        y=fitted['degradation'],
+        marker=dict(color=[COMPOUND_COLORS.get(c, '#888888') for c in fitted['compound']]),
+        text=fitted['compound']
+    ))
+    
+    fig.update_layout(
+        title=f'Tyre Degradation (fuel corrected, {FUEL_EFFECT:.3f} s/lap)',
+        yaxis_title='Seconds lost per lap of tyre age',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='white'
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.dataframe(
+        stints[['driver', 'stint', 'compound', 'start_lap', 'end_lap', 'laps',
+                'fit_laps', 'mean_time', 'best_time', 'degradation']].round(3),
+        hide_index=True,
+        use_container_width=True
+    )
+
+def show_telemetry_analysis(session, session_key, selected_drivers):
     st.subheader("📈 Telemetry Data Analysis")
     
     if len(selected_drivers) == 0:
         st.warning("Please select drivers for telemetry analysis")
         return
     
-    # Lap selection for telemetry
-    lap_number = st.selectbox(
-        "Select Lap for Telemetry Analysis",
-        range(1, 21),  # Limit to first 20 laps for performance
-        index=4  # Default to lap 5
-    )
-    
     try:
+        # Built once per session; switching laps or drivers only slices it
+        with st.spinner("Indexing telemetry..."):
+            telemetry_index = get_telemetry_index(session_key, session)
+        
+        lap_numbers = sorted({lap for driver in selected_drivers
+                              for lap in telemetry_index.get(driver, {})})
+        if not lap_numbers:
+            st.info("Telemetry data not available for selected drivers")
+            return
+        
+        # Lap selection for telemetry
+        lap_number = st.selectbox(
+            "Select Lap for Telemetry Analysis",
+            lap_numbers,
+            index=lap_numbers.index(5) if 5 in lap_numbers else 0  # Default to lap 5
+        )
+        
         telemetry_data = []
-        for driver in selected_drivers[:2]:  # Limit to 2 drivers for performance
-            driver_lap = session.laps.pick_driver(driver).pick_lap(lap_number)
-            if driver_lap is not None and hasattr(driver_lap, 'get_telemetry'):
-                tel = driver_lap.get_telemetry()
-                tel['Driver'] = driver
-                telemetry_data.append(tel)
+        for driver in selected_drivers:
+            columns = telemetry_index.get(driver, {}).get(lap_number)
+            if columns is not None:
+                telemetry_data.append(pd.DataFrame({
+                    'Distance': columns['distance'],
+                    'Speed': columns['speed'],
+                    'Driver': driver
+                }))
         
         if telemetry_data:
             combined_tel = pd.concat(telemetry_data)
             
             # Speed comparison
-            fig = px.line(
-                combined_tel,
-                x='Distance',
-                y='Speed',
-                color='Driver',
-                title=f'Speed Comparison - Lap {lap_number}',
-                labels={'Speed': 'Speed (km/h)', 'Distance': 'Distance (m)'}
-            )
+            fig = go.Figure(driver_traces(combined_tel, 'Distance', 'Speed', selected_drivers))
             
             fig.update_layout(
+                title=f'Speed Comparison - Lap {lap_number}',
+                xaxis_title='Distance (m)',
+                yaxis_title='Speed (km/h)',
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)',
                 font_color='white'
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from stints import FUEL_EFFECT, stint_table
+
+
+def stint_columns(time):
+    """Lap columns of one driver running a single stint from lap 1"""
+    n = len(time)
+    return {
+        "driver": np.full(n, 'D01', dtype=object),
+        "number": np.full(n, '1', dtype=object),
+        "lap": np.arange(1, n + 1),
+        "time": np.asarray(time, dtype=float),
+        "compound": np.full(n, 'MEDIUM', dtype=object),
+        "pit_out_time": np.zeros(n, dtype=bool),
+        "pit_in_time": np.zeros(n, dtype=bool)
+    }
+
+
+def test_fuel_burn_only_stint_has_no_degradation():
+    lap = np.arange(1, 31)
+    table = stint_table(stint_columns(90 - FUEL_EFFECT * lap))
+
+    assert table['degradation'][0] == pytest.approx(0, abs=1e-9)
+    assert table['raw_slope'][0] == pytest.approx(-FUEL_EFFECT)
+
+
+def test_degradation_adds_back_the_fuel_effect():
+    lap = np.arange(1, 31)
+    table = stint_table(stint_columns(90 + (0.05 - FUEL_EFFECT) * lap))
+
+    assert table['degradation'][0] == pytest.approx(0.05)
+    assert table['raw_slope'][0] == pytest.approx(0.05 - FUEL_EFFECT)
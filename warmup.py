@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+FastF1 cache warm-up
+Pre-loads whole seasons into the on-disk cache so no visitor pays for a cold load
+
+Usage:
+    python warmup.py --years 2023-2024 --sessions R,Q --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from session_cache import (CACHE_DIR, SESSION_TIERS, import_fastf1, load_fastf1_session,
+                           tier_rank, use_fastf1_cache)
+from disk_cache import disk_cache
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'warmup-manifest.json'
+DEFAULT_SESSIONS = ('R',)
+DEFAULT_WORKERS = 2
+# Upper bound for warm-ups started through the API
+MAX_API_WORKERS = 4
+
+
+def parse_years(spec):
+    """Parse '2023', '2021-2023' or '2019,2021-2022' into a sorted year list"""
+    years = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(p) for p in part.split('-', 1))
+            years.update(range(start, end + 1))
+        else:
+            years.add(int(part))
+    return sorted(years)
+
+
+def task_key(year, round_number, session_type):
+    """Manifest key for one session"""
+    return f"{year}/{round_number:02d}/{session_type}"
+
+
+class WarmupManifest:
+    """Completed sessions, persisted after every task so a run can resume"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable warm-up manifest: {e}")
+
+    def is_done(self, key, tier):
+        """True if the session was warmed to at least ``tier`` and is still on disk
+
+        Sessions the disk cache has evicted since are warmed again.
+        """
+        entry = self.entries.get(key)
+        if entry is None or tier_rank(entry['tier']) < tier_rank(tier):
+            return False
+        path = entry.get('path')
+        return path is None or os.path.isdir(os.path.join(self.cache_dir, path))
+
+    def mark_done(self, key, tier, seconds, directory=None):
+        """Record a finished session and write the manifest atomically"""
+        self.entries[key] = {
+            "tier": tier,
+            "seconds": round(seconds, 1),
+            "finished": datetime.utcnow().isoformat(timespec='seconds')
+        }
+        if directory is not None:
+            self.entries[key]['path'] = os.path.relpath(directory, self.cache_dir)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def plan_sessions(years, session_types):
+    """List (year, round, event name, session type) for sessions that already ran"""
+    import fastf1
+    import pandas as pd
+    now = pd.Timestamp.utcnow().tz_localize(None)
+    tasks = []
+    for year in years:
+        schedule = fastf1.get_event_schedule(year, include_testing=False)
+        for i in range(len(schedule)):
+            event = schedule.iloc[i]  # an Event, so session lookups are available
+            round_number = int(event['RoundNumber'])
+            for session_type in session_types:
+                try:
+                    session_date = event.get_session_date(session_type, utc=True)
+                except ValueError:
+                    continue  # e.g. sprint sessions at non-sprint weekends
+                if pd.isna(session_date) or session_date > now:
+                    continue
+                tasks.append((year, round_number, event['EventName'], session_type))
+    return tasks
+
+
+def _init_worker(cache_dir):
+    """Process pool initializer: quiet logging and a shared disk cache"""
+    logging.getLogger('fastf1').setLevel(logging.WARNING)
+    use_fastf1_cache(cache_dir)
+    import_fastf1()
+
+
+def worker_pool(workers, cache_dir=CACHE_DIR):
+    """Process pool of session loaders sharing ``cache_dir``
+
+    Workers are spawned rather than forked: the API starts pools from
+    request threads, and a fork would copy locks (FastF1 import, disk cache,
+    logging) that another thread may be holding at that moment.
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(cache_dir,),
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def warm_session(year, round_number, session_type, tier):
+    """Load one session in a worker process so FastF1 fills its cache
+
+    Returns the load time and the session's cache directory (None if unknown).
+    """
+    started = time.time()
+    session = load_fastf1_session(year, round_number, session_type, tier=tier)
+    return time.time() - started, disk_cache.fastf1_session_dir(session)
+
+
+def run_warmup(years, session_types=DEFAULT_SESSIONS, workers=DEFAULT_WORKERS,
+               cache_dir=CACHE_DIR, tier='telemetry', force=False, progress=None):
+    """Warm every past session of the given seasons, returns a summary dict
+
+    ``progress`` is called with a status dict after every finished task.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    use_fastf1_cache(cache_dir)
+    import_fastf1()
+    manifest = WarmupManifest(cache_dir)
+
+    tasks = plan_sessions(years, session_types)
+    pending = [t for t in tasks
+               if force or not manifest.is_done(task_key(t[0], t[1], t[3]), tier)]
+    status = {
+        "total": len(tasks),
+        "skipped": len(tasks) - len(pending),
+        "done": 0,
+        "failed": [],
+        "current": None
+    }
+    logger.info(f"Warm-up: {len(pending)} of {len(tasks)} sessions to load "
+                f"with {workers} worker(s)")
+    if progress:
+        progress(dict(status))
+
+    with worker_pool(workers, cache_dir) as pool:
+        futures = {
+            pool.submit(warm_session, year, round_number, session_type, tier):
+                (year, round_number, event_name, session_type)
+            for year, round_number, event_name, session_type in pending
+        }
+        for future in as_completed(futures):
+            year, round_number, event_name, session_type = futures[future]
+            key = task_key(year, round_number, session_type)
+            label = f"{year} {event_name} {session_type}"
+            try:
+                seconds, directory = future.result()
+                manifest.mark_done(key, tier, seconds, directory)
+                status['done'] += 1
+                logger.info(f"[{status['done'] + len(status['failed'])}/{len(pending)}] "
+                            f"{label} cached in {seconds:.1f}s")
+            except Exception as e:
+                status['failed'].append({"session": key, "error": str(e)})
+                logger.error(f"Failed to warm {label}: {str(e)}")
+            status['current'] = label
+            if progress:
+                progress(dict(status))
+
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fill the FastF1 cache for whole seasons")
+    parser.add_argument('--years', required=True, help="e.g. 2023 or 2021-2023")
+    parser.add_argument('--sessions', default=','.join(DEFAULT_SESSIONS),
+                        help="Comma separated session types (R, Q, S, FP1...)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--tier', choices=SESSION_TIERS, default='telemetry',
+                        help="How much of each session to load")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true', help="Reload sessions already warmed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    status = run_warmup(
+        parse_years(args.years),
+        session_types=[s.strip() for s in args.sessions.split(',') if s.strip()],
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        tier=args.tier,
+        force=args.force
+    )
+    print(f"Warm-up finished: {status['done']} loaded, {status['skipped']} already cached, "
+          f"{len(status['failed'])} failed")
+    return 1 if status['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())